@@ -0,0 +1,119 @@
+import json
+from hashlib import md5
+from time import monotonic, sleep, time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+
+class AnonymousResponseCache:
+    poll_interval = 0.05
+    cached_headers = ('ETag', 'Last-Modified')
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.generation_key = f'{prefix}:generation'
+
+    def get_generation(self):
+        cache.add(self.generation_key, uuid4().hex, None)
+        return cache.get(self.generation_key)
+
+    def invalidate(self):
+        cache.set(self.generation_key, uuid4().hex, None)
+
+    def get_key(self, request):
+        params = sorted(
+            (key, sorted(values))
+            for key, values in request.query_params.lists()
+        )
+        key = json.dumps((request.get_host(), request.path, params))
+        return f'{self.prefix}:{md5(key.encode()).hexdigest()}'
+
+    def is_fresh(self, entry, generation):
+        return (
+            entry is not None
+            and entry[0] == generation
+            and time() - entry[1] < settings.RESPONSE_CACHE_TIMEOUT
+        )
+
+    def wait(self, key, lock_key, generation):
+        deadline = monotonic() + settings.RESPONSE_CACHE_LOCK_WAIT
+        while monotonic() < deadline:
+            sleep(self.poll_interval)
+            entry = cache.get(key)
+            if entry is not None and entry[0] == generation:
+                return entry
+            if cache.get(lock_key) is None:
+                return None
+        return None
+
+    def respond(self, request, entry):
+        headers = entry[3]
+        response = get_conditional_response(
+            request,
+            etag=headers.get('ETag'),
+            last_modified=parse_http_date_safe(headers.get('Last-Modified'))
+        )
+        if response is None:
+            response = Response(entry[2])
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def store(self, key, generation, response):
+        if response.status_code == 304:
+            return
+        if response.status_code != 200:
+            cache.delete(key)
+            return
+        cache.set(
+            key,
+            (
+                generation,
+                time(),
+                response.data,
+                {
+                    name: response[name]
+                    for name in self.cached_headers
+                    if response.has_header(name)
+                },
+            ),
+            settings.RESPONSE_CACHE_TIMEOUT
+            + settings.RESPONSE_CACHE_STALE_TIMEOUT
+        )
+
+    def fetch(self, request, handler, *args, **kwargs):
+        if (
+            request.user.is_authenticated
+            or not settings.RESPONSE_CACHE_TIMEOUT
+        ):
+            return handler(request, *args, **kwargs)
+        key = self.get_key(request)
+        generation = self.get_generation()
+        entry = cache.get(key)
+        if self.is_fresh(entry, generation):
+            return self.respond(request, entry)
+        lock_key = f'{key}:lock'
+        if not cache.add(lock_key, 1, settings.RESPONSE_CACHE_LOCK_TIMEOUT):
+            if entry is None or entry[0] != generation:
+                entry = self.wait(key, lock_key, generation)
+            if entry is not None:
+                return self.respond(request, entry)
+            return handler(request, *args, **kwargs)
+        try:
+            response = handler(request, *args, **kwargs)
+        except Exception:
+            cache.delete(key)
+            raise
+        else:
+            self.store(key, generation, response)
+        finally:
+            cache.delete(lock_key)
+        return response
+
+
+recipe_response_cache = AnonymousResponseCache('recipes-response')
@@ -1,17 +1,55 @@
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, When
+from django.db.models.functions import Upper
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Recipe, Tag
-from rest_framework.filters import SearchFilter
+from recipes.catalog import catalog
+from recipes.models import Recipe
+from rest_framework.filters import BaseFilterBackend
 from users.models import User
 
 
-class IngredientFilter(SearchFilter):
+class IngredientFilter(BaseFilterBackend):
     search_param = 'name'
 
+    def filter_queryset(self, request, queryset, view):
+        if view.action != 'list':
+            return queryset
+        term = request.query_params.get(self.search_param, '').strip()
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        if connections[queryset.db].vendor == 'postgresql' and term:
+            return queryset.annotate(
+                upper_name=Upper('name'),
+            ).filter(
+                Q(name__icontains=term)
+                | Q(upper_name__trigram_similar=term.upper())
+            ).annotate(
+                rank=Case(
+                    When(name__istartswith=term, then=0),
+                    When(name__icontains=term, then=1),
+                    default=2,
+                    output_field=IntegerField()
+                ),
+                similarity=TrigramSimilarity('name', term),
+            ).order_by('rank', '-similarity', 'name')[:limit]
+        return catalog.load().search_ingredients(term, limit)
+
+
+class RecipeOrderingFilter(filters.OrderingFilter):
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        return qs.order_by(
+            *(self.get_ordering_value(param) for param in value), '-id'
+        )
+
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        to_field_name='slug',
+    tags = filters.MultipleChoiceFilter(
+        choices=lambda: [
+            (tag.slug, tag.name) for tag in catalog.load().tags.values()
+        ],
         field_name='tags__slug',
         label='Tags'
     )
@@ -22,6 +60,9 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    ordering = RecipeOrderingFilter(
+        fields=('pub_date', 'favorites_count', 'cart_count')
+    )
 
     class Meta:
         model = Recipe
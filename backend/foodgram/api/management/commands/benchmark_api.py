@@ -0,0 +1,514 @@
+import csv
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from urllib.parse import quote
+
+from api.cache import recipe_response_cache
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from recipes.catalog import catalog
+from recipes.feed import rebuild_feeds
+from recipes.matching import match_index
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientList, Recipe,
+                            ShoppingList, ShoppingListIngredient, Tag,
+                            TrendingRecipe)
+from recipes.search import update_search_vectors
+from recipes.user_state import USER_STATE_KEY
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Follow, User
+
+ENDPOINTS = (
+    ('ingredients-list', 'get', '/api/ingredients/', False),
+    ('ingredients-search', 'get', '/api/ingredients/?name={prefix}', False),
+    ('ingredients-detail', 'get', '/api/ingredients/{ingredient}/', False),
+    ('tags-list', 'get', '/api/tags/', False),
+    ('tags-detail', 'get', '/api/tags/{tag}/', False),
+    ('recipes-list-anonymous', 'get', '/api/recipes/?limit={limit}', False),
+    ('recipes-list', 'get', '/api/recipes/?limit={limit}', True),
+    ('recipes-list-tags', 'get',
+     '/api/recipes/?limit={limit}&tags={tag_slug}', True),
+    ('recipes-list-favorited', 'get',
+     '/api/recipes/?limit={limit}&is_favorited=1', True),
+    ('recipes-list-in-cart', 'get',
+     '/api/recipes/?limit={limit}&is_in_shopping_cart=1', True),
+    ('recipes-list-author', 'get',
+     '/api/recipes/?limit={limit}&author={author}', True),
+    ('recipes-detail', 'get', '/api/recipes/{recipe}/', True),
+    ('recipes-search', 'get',
+     '/api/recipes/search/?limit={limit}&q={search}', True),
+    ('recipes-match', 'get',
+     '/api/recipes/match/?limit={limit}&ingredients={match}', True),
+    ('recipes-trending', 'get', '/api/recipes/trending/?limit={limit}', True),
+    ('recipes-feed', 'get', '/api/recipes/feed/?limit={limit}', True),
+    ('recipes-create', 'post', '/api/recipes/', True),
+    ('recipes-update', 'patch', '/api/recipes/{own_recipe}/', True),
+    ('recipes-delete', 'delete', '/api/recipes/{deleted_recipe}/', True),
+    ('recipes-favorite-add', 'post', '/api/recipes/{free_recipe}/favorite/',
+     True),
+    ('recipes-favorite-delete', 'delete',
+     '/api/recipes/{free_recipe}/favorite/', True),
+    ('recipes-cart-add', 'post', '/api/recipes/{free_recipe}/shopping_cart/',
+     True),
+    ('recipes-cart-delete', 'delete',
+     '/api/recipes/{free_recipe}/shopping_cart/', True),
+    ('recipes-favorite-batch-add', 'post', '/api/recipes/favorite/batch/',
+     True),
+    ('recipes-favorite-batch-delete', 'delete',
+     '/api/recipes/favorite/batch/', True),
+    ('recipes-cart-batch-add', 'post', '/api/recipes/shopping_cart/batch/',
+     True),
+    ('recipes-cart-batch-delete', 'delete',
+     '/api/recipes/shopping_cart/batch/', True),
+    ('recipes-download-cart', 'get', '/api/recipes/download_shopping_cart/',
+     True),
+    ('users-list', 'get', '/api/users/?limit={limit}', True),
+    ('users-detail', 'get', '/api/users/{author}/', True),
+    ('users-me', 'get', '/api/users/me/', True),
+    ('users-subscriptions', 'get',
+     '/api/users/subscriptions/?limit={limit}&recipes_limit=3', True),
+    ('users-subscribe', 'post', '/api/users/{free_author}/subscribe/', True),
+    ('users-unsubscribe', 'delete', '/api/users/{free_author}/subscribe/',
+     True),
+    ('users-create', 'post', '/api/users/', False),
+    ('users-set-password', 'post', '/api/users/set_password/', True),
+    ('auth-login', 'post', '/api/auth/token/login/', False),
+    ('auth-logout', 'post', '/api/auth/token/logout/', True),
+)
+BENCHMARK_PASSWORD = 'benchmark'
+NEW_USER = {
+    'email': 'bench_new@example.com',
+    'username': 'bench_new',
+    'first_name': 'Bench',
+    'last_name': 'New',
+    'password': 'Bench-Password-2023',
+}
+BENCHMARK_IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAA'
+    'CVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNoAAAA'
+    'ggCByxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+def get_read_params(recipe, ingredient, tag, author_id, limit):
+    return {
+        'limit': limit,
+        'prefix': ingredient.name[:2],
+        'ingredient': ingredient.id,
+        'tag': tag.id,
+        'tag_slug': tag.slug,
+        'author': author_id,
+        'recipe': recipe.id,
+        'search': quote(recipe.name.split()[0]),
+        'match': ','.join(
+            str(ingredient_id)
+            for ingredient_id in IngredientList.objects.filter(
+                recipe=recipe
+            ).values_list('ingredient_id', flat=True)[:5]
+        ),
+    }
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, int(round(percent / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетические данные и замеряет количество SQL-запросов, '
+        'время ответа и память для эндпоинтов API. Данные удаляются '
+        'после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок на пользователя')
+        parser.add_argument('--favorites', type=int, default=30,
+                            help='Избранных рецептов на пользователя')
+        parser.add_argument('--carts', type=int, default=10,
+                            help='Рецептов в списке покупок на пользователя')
+        parser.add_argument('--limit', type=int, default=6,
+                            help='Размер страницы для списков')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--endpoint', action='append', default=[],
+                            help='Замерить только указанные эндпоинты')
+        parser.add_argument('--output', help='Файл для JSON-отчета')
+        parser.add_argument(
+            '--budget',
+            help='JSON-файл с лимитами вида '
+                 '{"recipes-list": {"queries": 10, "p95_ms": 50}}'
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        with transaction.atomic():
+            context = self.generate(options)
+            self.reset_caches(context['user_ids'])
+            match_index.rebuild()
+            report = self.run(context, options)
+            transaction.set_rollback(True)
+        self.reset_caches(context['user_ids'])
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(text)
+        else:
+            self.stdout.write(text)
+        if options['budget']:
+            self.check_budget(report, options['budget'])
+
+    def reset_caches(self, user_ids):
+        catalog.invalidate()
+        match_index.invalidate()
+        recipe_response_cache.invalidate()
+        cache.delete_many(
+            [USER_STATE_KEY.format(user_id) for user_id in user_ids]
+        )
+
+    def generate(self, options):
+        if options['users'] < 2:
+            raise CommandError('Нужно не меньше двух пользователей.')
+        follows_per_user = min(options['follows'], options['users'] - 2)
+        with open(
+            f'{settings.BASE_DIR}/data/ingredients.csv', encoding='utf-8'
+        ) as csv_file:
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in csv.reader(csv_file)
+                ],
+                ignore_conflicts=True
+            )
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        Tag.objects.bulk_create(
+            [
+                Tag(name=f'bench-{index}', color=f'#00000{index}',
+                    slug=f'bench-{index}')
+                for index in range(3)
+            ],
+            ignore_conflicts=True
+        )
+        tags = list(Tag.objects.filter(slug__startswith='bench-'))
+        password = make_password(BENCHMARK_PASSWORD)
+        User.objects.bulk_create(
+            User(
+                username=f'bench_{index}',
+                email=f'bench_{index}@example.com',
+                first_name='Bench',
+                last_name=str(index),
+                password=password,
+            ) for index in range(options['users'])
+        )
+        users = list(User.objects.filter(username__startswith='bench_'))
+        user_ids = [user.id for user in users]
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=random.choice(users),
+                name=f'Рецепт {index}',
+                image='media/images/benchmark.png',
+                text='Описание рецепта ' * 20,
+                cooking_time=random.randint(1, 120),
+            ) for index in range(options['recipes'])
+        )
+        recipe_ids = list(
+            Recipe.objects.filter(author__in=users).values_list(
+                'id', flat=True
+            )
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.id)
+            for recipe_id in recipe_ids
+            for tag in random.sample(tags, 2)
+        )
+        IngredientList.objects.bulk_create(
+            IngredientList(
+                recipe_id=recipe_id, ingredient_id=ingredient_id,
+                amount=random.randint(1, 500)
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in random.sample(
+                ingredient_ids, options['ingredients_per_recipe']
+            )
+        )
+        follows, favorites, carts = [], [], []
+        for user_id in user_ids:
+            follows.extend(
+                Follow(user_id=user_id, author_id=author_id)
+                for author_id in random.sample(user_ids, follows_per_user)
+                if author_id != user_id
+            )
+            favorites.extend(
+                FavoriteRecipe(author_id=user_id, recipe_id=recipe_id)
+                for recipe_id in random.sample(
+                    recipe_ids, min(options['favorites'], len(recipe_ids))
+                )
+            )
+            carts.extend(
+                ShoppingList(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in random.sample(
+                    recipe_ids, min(options['carts'], len(recipe_ids))
+                )
+            )
+        Follow.objects.bulk_create(follows)
+        FavoriteRecipe.objects.bulk_create(favorites)
+        ShoppingList.objects.bulk_create(carts)
+        ShoppingListIngredient.objects.rebuild(user_ids)
+        user = users[0]
+        rebuild_feeds((user.id,))
+        update_search_vectors(recipe_ids)
+        TrendingRecipe.objects.all().delete()
+        TrendingRecipe.objects.bulk_create(
+            TrendingRecipe(recipe_id=recipe_id, rank=rank, score=1 / rank)
+            for rank, recipe_id in enumerate(recipe_ids[:100], 1)
+        )
+        own_recipe = Recipe.objects.filter(author=user).values_list(
+            'id', flat=True
+        ).first()
+        if own_recipe is None:
+            own_recipe = recipe_ids[0]
+            Recipe.objects.filter(id=own_recipe).update(author=user)
+        taken = set(
+            FavoriteRecipe.objects.filter(author=user).values_list(
+                'recipe_id', flat=True
+            )
+        ) | set(
+            ShoppingList.objects.filter(user=user).values_list(
+                'recipe_id', flat=True
+            )
+        )
+        free_recipes = [
+            recipe_id for recipe_id in recipe_ids if recipe_id not in taken
+        ]
+        if not free_recipes:
+            raise CommandError(
+                'Все рецепты уже в избранном или в списке покупок, '
+                'увеличьте --recipes.'
+            )
+        followed = set(
+            Follow.objects.filter(user=user).values_list(
+                'author_id', flat=True
+            )
+        )
+        return {
+            'user': user,
+            'user_ids': user_ids,
+            'token': Token.objects.create(user=user).key,
+            'recipe_payload': {
+                'tags': [tag.id for tag in tags[:2]],
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': 100}
+                    for ingredient_id in ingredient_ids[
+                        :options['ingredients_per_recipe']
+                    ]
+                ],
+                'name': 'Новый рецепт',
+                'image': BENCHMARK_IMAGE,
+                'text': 'Описание рецепта ' * 20,
+                'cooking_time': 30,
+            },
+            'params': {
+                **get_read_params(
+                    Recipe.objects.get(id=recipe_ids[0]),
+                    Ingredient.objects.get(id=ingredient_ids[0]),
+                    tags[0],
+                    users[-1].id,
+                    options['limit']
+                ),
+                'own_recipe': own_recipe,
+                'deleted_recipe': None,
+                'free_recipe': free_recipes[0],
+                'batch_recipes': free_recipes[:options['limit']],
+                'free_author': next(
+                    user_id for user_id in user_ids[1:]
+                    if user_id not in followed
+                ),
+            },
+        }
+
+    def run(self, context, options):
+        client = APIClient()
+        anonymous = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {context["token"]}')
+        selected = set(options['endpoint'])
+        results = {}
+        for name, method, url, authenticated in ENDPOINTS:
+            if selected and name not in selected:
+                continue
+            api_client = client if authenticated else anonymous
+            payload = self.get_payload(name, context)
+            timings, queries, statuses = [], [], set()
+            tracemalloc.start()
+            for _ in range(options['repeat']):
+                self.prepare(name, context)
+                formatted_url = url.format(**context['params'])
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = getattr(api_client, method)(
+                        formatted_url, payload, format='json'
+                    )
+                    if response.streaming:
+                        for _ in response.streaming_content:
+                            pass
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries.append(len(captured))
+                statuses.add(response.status_code)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[name] = {
+                'method': method.upper(),
+                'url': formatted_url,
+                'status': sorted(statuses),
+                'queries': max(queries),
+                'p50_ms': round(statistics.median(timings), 2),
+                'p95_ms': round(percentile(timings, 95), 2),
+                'peak_memory_kb': round(peak / 1024, 1),
+            }
+        return results
+
+    def get_payload(self, name, context):
+        if name in ('recipes-create', 'recipes-update'):
+            return context['recipe_payload']
+        if name == 'users-create':
+            return NEW_USER
+        if name == 'users-set-password':
+            return {
+                'current_password': BENCHMARK_PASSWORD,
+                'new_password': NEW_USER['password'],
+            }
+        if name == 'auth-login':
+            return {
+                'email': context['user'].email,
+                'password': BENCHMARK_PASSWORD,
+            }
+        if 'batch' in name:
+            return {'recipes': context['params']['batch_recipes']}
+        return None
+
+    def prepare(self, name, context):
+        user = context['user']
+        params = context['params']
+        single = (params['free_recipe'],)
+        batch = params['batch_recipes']
+        steps = {
+            'recipes-favorite-add': (self.set_favorites, single, False),
+            'recipes-favorite-delete': (self.set_favorites, single, True),
+            'recipes-favorite-batch-add': (self.set_favorites, batch, False),
+            'recipes-favorite-batch-delete': (
+                self.set_favorites, batch, True
+            ),
+            'recipes-cart-add': (self.set_cart, single, False),
+            'recipes-cart-delete': (self.set_cart, single, True),
+            'recipes-cart-batch-add': (self.set_cart, batch, False),
+            'recipes-cart-batch-delete': (self.set_cart, batch, True),
+        }
+        if name in steps:
+            method, recipe_ids, present = steps[name]
+            method(user, recipe_ids, present)
+        elif name == 'recipes-delete':
+            params['deleted_recipe'] = self.create_recipe(user, context)
+        elif name == 'users-subscribe':
+            Follow.objects.filter(
+                user=user, author_id=params['free_author']
+            ).delete()
+        elif name == 'users-unsubscribe':
+            Follow.objects.get_or_create(
+                user=user, author_id=params['free_author']
+            )
+        else:
+            self.prepare_auth(name, context)
+
+    def prepare_auth(self, name, context):
+        user = context['user']
+        if name == 'users-create':
+            User.objects.filter(username=NEW_USER['username']).delete()
+        elif name in ('users-set-password', 'auth-login'):
+            user.set_password(BENCHMARK_PASSWORD)
+            user.save(update_fields=('password',))
+        elif name == 'auth-logout':
+            Token.objects.get_or_create(
+                user=user, defaults={'key': context['token']}
+            )
+
+    def set_favorites(self, user, recipe_ids, present):
+        if not present:
+            FavoriteRecipe.objects.filter(
+                author=user, recipe_id__in=recipe_ids
+            ).delete()
+            return
+        FavoriteRecipe.objects.bulk_create(
+            (
+                FavoriteRecipe(author=user, recipe_id=recipe_id)
+                for recipe_id in recipe_ids
+            ),
+            ignore_conflicts=True
+        )
+
+    def set_cart(self, user, recipe_ids, present):
+        existing = set(
+            ShoppingList.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True)
+        )
+        if not present:
+            ShoppingList.objects.filter(
+                user=user, recipe_id__in=existing
+            ).delete()
+            ShoppingListIngredient.objects.remove_recipes(user, existing)
+            return
+        missing = [
+            recipe_id for recipe_id in recipe_ids if recipe_id not in existing
+        ]
+        ShoppingList.objects.bulk_create(
+            ShoppingList(user=user, recipe_id=recipe_id)
+            for recipe_id in missing
+        )
+        ShoppingListIngredient.objects.add_recipes(user, missing)
+
+    def create_recipe(self, user, context):
+        payload = context['recipe_payload']
+        recipe = Recipe.objects.create(
+            author=user,
+            name=payload['name'],
+            image='media/images/benchmark.png',
+            text=payload['text'],
+            cooking_time=payload['cooking_time'],
+        )
+        recipe.tags.set(payload['tags'])
+        IngredientList.objects.bulk_create(
+            IngredientList(
+                recipe=recipe,
+                ingredient_id=ingredient['id'],
+                amount=ingredient['amount'],
+            ) for ingredient in payload['ingredients']
+        )
+        return recipe.id
+
+    def check_budget(self, report, path):
+        with open(path, encoding='utf-8') as file:
+            budget = json.load(file)
+        errors = []
+        for name, limits in budget.items():
+            if name not in report:
+                continue
+            for metric, limit in limits.items():
+                value = report[name].get(metric)
+                if value is not None and value > limit:
+                    errors.append(f'{name}: {metric} = {value} > {limit}')
+        if errors:
+            raise CommandError(
+                'Превышен бюджет производительности:\n' + '\n'.join(errors)
+            )
+        self.stdout.write(self.style.SUCCESS('Бюджет не превышен.'))
@@ -0,0 +1,112 @@
+import json
+
+from api.management.commands.benchmark_api import ENDPOINTS, get_read_params
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import User
+
+
+def seq_scans(plan):
+    if plan['Node Type'] == 'Seq Scan':
+        rows = (
+            plan['Actual Rows'] + plan.get('Rows Removed by Filter', 0)
+        ) * plan['Actual Loops']
+        yield plan['Relation Name'], int(rows)
+    for child in plan.get('Plans', ()):
+        yield from seq_scans(child)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN ANALYZE для SQL-запросов GET-эндпоинтов API '
+        'и сообщает о последовательных сканированиях больших таблиц.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=int, default=1000,
+            help='Сообщать о Seq Scan, прочитавших больше строк'
+        )
+        parser.add_argument('--user', help='Email пользователя для запросов')
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--endpoint', action='append', default=[],
+                            help='Проверить только указанные эндпоинты')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Команда работает только с PostgreSQL.')
+        with transaction.atomic(), override_settings(
+            RESPONSE_CACHE_TIMEOUT=0, USER_STATE_CACHE_TIMEOUT=0
+        ):
+            params, user = self.get_params(options)
+            findings = self.run(params, user, options)
+            transaction.set_rollback(True)
+        if findings:
+            raise CommandError(
+                'Найдены последовательные сканирования:\n'
+                + '\n'.join(findings)
+            )
+        self.stdout.write(
+            self.style.SUCCESS('Последовательных сканирований не найдено.')
+        )
+
+    def get_params(self, options):
+        recipe = Recipe.objects.order_by('-pub_date', '-id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        tag = Tag.objects.order_by('id').first()
+        if recipe is None or ingredient is None or tag is None:
+            raise CommandError('В базе нет рецептов, ингредиентов или тегов.')
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(
+                    f'Пользователь {options["user"]} не найден.'
+                )
+        else:
+            user = recipe.author
+        params = get_read_params(
+            recipe, ingredient, tag, recipe.author_id, options['limit']
+        )
+        return params, user
+
+    def run(self, params, user, options):
+        token, _ = Token.objects.get_or_create(user=user)
+        client = APIClient()
+        anonymous = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        selected = set(options['endpoint'])
+        findings = []
+        for name, method, url, authenticated in ENDPOINTS:
+            if method != 'get' or selected and name not in selected:
+                continue
+            url = url.format(**params)
+            with CaptureQueriesContext(connection) as captured:
+                response = (client if authenticated else anonymous).get(url)
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+            self.stdout.write(
+                f'{name} {url}: {response.status_code}, '
+                f'запросов {len(captured)}'
+            )
+            for query in captured.captured_queries:
+                findings.extend(
+                    f'{name}: {relation}, строк {rows}'
+                    for relation, rows in self.explain(query['sql'])
+                    if rows > options['threshold']
+                )
+        return findings
+
+    def explain(self, sql):
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        yield from seq_scans(plan[0]['Plan'])
@@ -1,6 +1,197 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from functools import partial
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from recipes.feed import feed_recipes
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 6
+    ordering = ('-id',)
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = getattr(view, 'keyset_ordering', self.ordering)
+        self.page_size = self.get_page_size(request)
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+        results = self.get_results(queryset, self.decode_cursor(request))
+        self.next_position = None
+        if len(results) > self.page_size:
+            results = results[:self.page_size]
+            self.next_position = [
+                field.value_to_string(results[-1]) for field in self.fields
+            ]
+        return results
+
+    def get_results(self, queryset, position):
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        return list(queryset[:self.page_size + 1])
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    def after(self, position):
+        condition = Q()
+        equal = Q()
+        for name, field, value in zip(self.ordering, self.fields, position):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{field.name}__{lookup}': value})
+            equal &= Q(**{field.name: value})
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(urlsafe_b64decode(encoded.encode()))
+            if len(position) != len(self.fields):
+                raise ValueError
+            return [
+                field.to_python(value)
+                for field, value in zip(self.fields, position)
+            ]
+        except (BinasciiError, ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        cursor = urlsafe_b64encode(
+            json.dumps(self.next_position).encode()
+        ).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+
+class FeedPagination(KeysetPagination):
+    ordering = ('-pub_date', '-id')
+
+    def get_results(self, queryset, position):
+        return feed_recipes(
+            queryset, self.request.user, position, self.page_size + 1
+        )
+
+
+class CachedCountPaginator(Paginator):
+    def __init__(self, *args, cache_key=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_key = cache_key
+        self.count_exact = True
+
+    @cached_property
+    def count(self):
+        timeout = settings.PAGINATION_COUNT_CACHE_TIMEOUT
+        if self.cache_key and timeout:
+            cached = cache.get(self.cache_key)
+            if cached is not None:
+                self.count_exact = cached[1]
+                return cached[0]
+        count = self.estimate_count()
+        if count is None:
+            count = super().count
+        else:
+            self.count_exact = False
+        if self.cache_key and timeout:
+            cache.set(self.cache_key, (count, self.count_exact), timeout)
+        return count
+
+    def estimate_count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet) or (
+            connections[queryset.db].vendor != 'postgresql'
+        ):
+            return None
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+        if estimate < settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD:
+            return None
+        return estimate
 
 
 class StandartProjectPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+    keyset_pagination_class = KeysetPagination
+    count_cache_ignored_params = (
+        PageNumberPagination.page_query_param,
+        page_size_query_param,
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.supports_keyset(queryset, view) and (
+            self.keyset_pagination_class.cursor_query_param
+            in request.query_params
+        ):
+            self.keyset = self.keyset_pagination_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.django_paginator_class = partial(
+            CachedCountPaginator,
+            cache_key=self.get_count_cache_key(request)
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def supports_keyset(self, queryset, view):
+        if not isinstance(queryset, QuerySet):
+            return False
+        ordering = getattr(
+            view, 'keyset_ordering', self.keyset_pagination_class.ordering
+        )
+        return tuple(queryset.query.order_by) in ((), tuple(ordering))
+
+    def get_count_cache_key(self, request):
+        params = sorted(
+            (key, sorted(values))
+            for key, values in request.query_params.lists()
+            if key not in self.count_cache_ignored_params
+        )
+        user_id = request.user.id if request.user.is_authenticated else None
+        key = json.dumps((request.path, user_id, params))
+        return f'pagination-count:{md5(key.encode()).hexdigest()}'
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return Response({
+            'count': self.page.paginator.count,
+            'count_exact': self.page.paginator.count_exact,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
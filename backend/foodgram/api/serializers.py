@@ -1,28 +1,64 @@
+from collections import Counter
+
 from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
+from recipes.catalog import catalog
 from recipes.models import (FavoriteRecipe, Ingredient, IngredientList, Recipe,
-                            ShoppingList, Tag)
+                            ShoppingList, ShoppingListIngredient, Tag)
+from recipes.signals import recipe_changed
+from recipes.user_state import get_user_state
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 from users.models import Follow, User
 from users.serializers import CustomUserSerializer
 
 
+def get_image_variants(obj, request):
+    storage = obj.image.storage
+    return {
+        image_format: {
+            width: (
+                request.build_absolute_uri(storage.url(name)) if request
+                else storage.url(name)
+            ) for width, name in widths.items()
+        } for image_format, widths in obj.image_variants.items()
+    }
+
+
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit')
 
 
+class CatalogPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    def __init__(self, catalog_attr, **kwargs):
+        self.catalog_attr = catalog_attr
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return catalog.get(self.catalog_attr, int(data))
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
 class IngredientListSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
+    id = CatalogPrimaryKeyRelatedField(
+        catalog_attr='ingredients',
         queryset=Ingredient.objects.all()
     )
-    name = serializers.ReadOnlyField(
-        source='ingredient.name'
+    name = serializers.SerializerMethodField(
+        read_only=True,
+        method_name='get_name'
     )
-    measurement_unit = serializers.ReadOnlyField(
-        source='ingredient.measurement_unit'
+    measurement_unit = serializers.SerializerMethodField(
+        read_only=True,
+        method_name='get_measurement_unit'
     )
     amount = serializers.IntegerField()
 
@@ -30,6 +66,14 @@ class IngredientListSerializer(serializers.ModelSerializer):
         model = IngredientList
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
+    def get_name(self, obj):
+        return catalog.get('ingredients', obj.ingredient_id).name
+
+    def get_measurement_unit(self, obj):
+        return catalog.get(
+            'ingredients', obj.ingredient_id
+        ).measurement_unit
+
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
@@ -64,10 +108,35 @@ class FavoriteRecipeSerializer(serializers.ModelSerializer):
         ).data
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
+
+
+class IngredientMatchSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
+
+
 class ViewRecipeSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField(
+        read_only=True,
+        method_name='get_image_variants'
+    )
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+
+    def get_image_variants(self, obj):
+        return get_image_variants(obj, self.context.get('request'))
 
 
 class FollowListSerializer(serializers.ModelSerializer):
@@ -99,19 +168,19 @@ class FollowListSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
-        if request:
-            user = request.user
-            if user.is_authenticated:
-                return Follow.objects.filter(user=user, author=obj).exists()
-        return False
+        if request is None:
+            return False
+        return obj.id in get_user_state(request).following
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        rec_limit = request.query_params.get('recipes_limit')
-        rec_count = self.get_recipes_count(obj)
-        recipes = Recipe.objects.filter(
-            author=obj
-        )[:int(rec_limit or rec_count)]
+        if hasattr(obj, 'recipes_preview'):
+            recipes = obj.recipes_preview
+        else:
+            rec_limit = request.query_params.get('recipes_limit')
+            recipes = Recipe.objects.filter(author=obj)
+            if rec_limit:
+                recipes = recipes[:int(rec_limit)]
         return ViewRecipeSerializer(
             recipes,
             many=True,
@@ -119,6 +188,8 @@ class FollowListSerializer(serializers.ModelSerializer):
         ).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return Recipe.objects.filter(author=obj).count()
 
 
@@ -161,6 +232,10 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only=True,
         method_name='get_is_in_shopping_cart'
     )
+    image_variants = serializers.SerializerMethodField(
+        read_only=True,
+        method_name='get_image_variants'
+    )
 
     class Meta:
         model = Recipe
@@ -173,35 +248,41 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time'
         )
 
+    def get_image_variants(self, obj):
+        return get_image_variants(obj, self.context.get('request'))
+
     def get_is_favorited(self, obj):
         request = self.context.get('request')
-        if request:
-            user = request.user
-            if user.is_authenticated:
-                return FavoriteRecipe.objects.filter(
-                    author=user,
-                    recipe__id=obj.id
-                ).exists()
-        return False
+        if request is None:
+            return False
+        return obj.id in get_user_state(request).favorites
 
     def get_is_in_shopping_cart(self, obj):
         request = self.context.get('request')
-        if request:
-            user = request.user
-            if user.is_authenticated:
-                return ShoppingList.objects.filter(
-                    user=user,
-                    recipe__id=obj.id
-                ).exists()
-        return False
+        if request is None:
+            return False
+        return obj.id in get_user_state(request).cart
+
+
+class RecipeMatchSerializer(RecipeSerializer):
+    matched_ingredients = serializers.IntegerField(read_only=True)
+    missing_ingredients = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'matched_ingredients',
+            'missing_ingredients',
+        )
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = CatalogPrimaryKeyRelatedField(
+        catalog_attr='tags',
         queryset=Tag.objects.all(),
         many=True
     )
@@ -272,23 +353,94 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 ) for ingredient in ingredients
             ]
         )
+        self.changes = {
+            'created': True,
+            'fields': sorted(validated_data),
+            'tags_changed': True,
+            'ingredients_added': sorted(
+                {ingredient['id'].id for ingredient in ingredients}
+            ),
+            'ingredients_updated': [],
+            'ingredients_removed': [],
+        }
+        transaction.on_commit(
+            lambda: recipe_changed.send(
+                sender=Recipe, recipe=recipe, changes=self.changes
+            )
+        )
         return recipe
 
+    def is_same_image(self, instance, image):
+        field = Recipe._meta.get_field('image')
+        return bool(instance.image) and field.storage.get_content_name(
+            field.generate_filename(instance, image.name), image
+        ) == instance.image.name
+
     @transaction.atomic
     def update(self, instance, validated_data):
+        if 'image' in validated_data and self.is_same_image(
+            instance, validated_data['image']
+        ):
+            del validated_data['image']
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        if tags:
+        tags_changed = bool(tags) and (
+            {tag.id for tag in tags}
+            != set(instance.tags.values_list('id', flat=True))
+        )
+        if tags_changed:
             instance.tags.set(tags)
-        IngredientList.objects.filter(recipe=instance).delete()
-        IngredientList.objects.bulk_create(
-            [
-                IngredientList(
-                    recipe=instance,
-                    amount=ingredient['amount'],
-                    ingredient=ingredient['id'],
-                ) for ingredient in ingredients
-            ]
+        submitted = Counter()
+        for ingredient in ingredients:
+            submitted[ingredient['id'].id] += ingredient['amount']
+        current = {}
+        to_update, to_delete = [], []
+        changes = Counter(submitted)
+        for item in IngredientList.objects.filter(recipe=instance):
+            changes[item.ingredient_id] -= item.amount
+            if (
+                item.ingredient_id not in submitted
+                or item.ingredient_id in current
+            ):
+                to_delete.append(item.id)
+                continue
+            current[item.ingredient_id] = item
+            if item.amount != submitted[item.ingredient_id]:
+                item.amount = submitted[item.ingredient_id]
+                to_update.append(item)
+        to_create = [
+            IngredientList(
+                recipe=instance,
+                ingredient_id=ingredient_id,
+                amount=amount,
+            ) for ingredient_id, amount in submitted.items()
+            if ingredient_id not in current
+        ]
+        IngredientList.objects.filter(id__in=to_delete).delete()
+        IngredientList.objects.bulk_update(to_update, ('amount',))
+        IngredientList.objects.bulk_create(to_create)
+        ShoppingListIngredient.objects.change_recipe(instance, changes)
+        self.changes = {
+            'created': False,
+            'fields': sorted(
+                name for name, value in validated_data.items()
+                if getattr(instance, name) != value
+            ),
+            'tags_changed': tags_changed,
+            'ingredients_added': sorted(
+                item.ingredient_id for item in to_create
+            ),
+            'ingredients_updated': sorted(
+                item.ingredient_id for item in to_update
+            ),
+            'ingredients_removed': sorted(
+                set(changes) - set(submitted)
+            ),
+        }
+        transaction.on_commit(
+            lambda: recipe_changed.send(
+                sender=Recipe, recipe=instance, changes=self.changes
+            )
         )
         return super().update(instance, validated_data)
 
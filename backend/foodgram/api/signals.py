@@ -0,0 +1,20 @@
+from api.cache import recipe_response_cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import Ingredient, IngredientList, Recipe, Tag
+from recipes.signals import recipe_changed
+
+
+@receiver(recipe_changed, sender=Recipe)
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(post_save, sender=IngredientList)
+@receiver(post_delete, sender=IngredientList)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_recipe_responses(sender, **kwargs):
+    transaction.on_commit(recipe_response_cache.invalidate)
@@ -1,17 +1,65 @@
+import csv
+import json
 from datetime import date
 
+SHOPPING_LIST_FORMATS = {}
 
+
+def shopping_list_format(name, content_type):
+    def register(writer):
+        SHOPPING_LIST_FORMATS[name] = (writer, content_type)
+        return writer
+    return register
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+@shopping_list_format('txt', 'text/plain; charset=utf-8')
 def make_shopping_list(input_objects, user):
-    result = []
-    result.append(
+    yield (
         f'Foodgram - список покупок\n'
         f'Пользователь: {user.first_name} {user.last_name}\n'
         f'Дата: {date.today().strftime("%d.%m.%Y")}\n\n'
     )
     for item in input_objects:
-        result.append(
+        yield (
             f'{item["ingredient__name"]} '
             f'({item["ingredient__measurement_unit"]}) - '
             f'{item["amount"]}\n'
         )
-    return ''.join(result)
+
+
+@shopping_list_format('csv', 'text/csv; charset=utf-8')
+def make_shopping_list_csv(input_objects, user):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Единицы измерения', 'Количество'))
+    for item in input_objects:
+        yield writer.writerow((
+            item['ingredient__name'],
+            item['ingredient__measurement_unit'],
+            item['amount'],
+        ))
+
+
+@shopping_list_format('json', 'application/json')
+def make_shopping_list_json(input_objects, user):
+    full_name = json.dumps(
+        f'{user.first_name} {user.last_name}', ensure_ascii=False
+    )
+    yield (
+        f'{{"user": {full_name}, '
+        f'"date": "{date.today().isoformat()}", '
+        f'"ingredients": ['
+    )
+    separator = ''
+    for item in input_objects:
+        yield separator + json.dumps({
+            'name': item['ingredient__name'],
+            'measurement_unit': item['ingredient__measurement_unit'],
+            'amount': item['amount'],
+        }, ensure_ascii=False)
+        separator = ', '
+    yield ']}'
@@ -1,44 +1,170 @@
+import json
+from calendar import timegm
 from datetime import datetime
+from hashlib import md5
+from itertools import chain
 
+from api.cache import recipe_response_cache
 from api.filters import IngredientFilter, RecipeFilter
-from api.pagination import StandartProjectPagination
+from api.pagination import FeedPagination, StandartProjectPagination
 from api.permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
-from api.serializers import (IngredientSerializer, RecipeCreateSerializer,
-                             RecipeSerializer, ShoppingListSerializer,
-                             TagSerializer, ViewRecipeSerializer)
-from api.utils import make_shopping_list
-from django.db.models import Sum
-from django.http import HttpResponse
+from api.serializers import (IngredientMatchSerializer, IngredientSerializer,
+                             RecipeCreateSerializer, RecipeIdsSerializer,
+                             RecipeMatchSerializer, RecipeSerializer,
+                             ShoppingListSerializer, TagSerializer,
+                             ViewRecipeSerializer)
+from api.utils import SHOPPING_LIST_FORMATS
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.models import (FavoriteRecipe, Ingredient, IngredientList, Recipe,
-                            ShoppingList, Tag)
+from recipes.activity import activity
+from recipes.catalog import catalog
+from recipes.matching import match_index
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingList,
+                            ShoppingListIngredient)
+from recipes.search import search_recipes
+from recipes.user_state import get_user_state, update_user_state
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+SHOPPING_LIST_CHUNK_SIZE = 500
+POPULARITY_COUNTERS = {
+    FavoriteRecipe: 'favorites_count',
+    ShoppingList: 'cart_count',
+}
+ACTIVITY_FIELDS = {
+    FavoriteRecipe: 'favorites',
+    ShoppingList: 'carts',
+}
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+
+class CatalogViewSet(viewsets.ReadOnlyModelViewSet):
+    catalog_attr = None
+
+    def get_object(self):
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not pk.isdigit():
+            raise Http404
+        try:
+            obj = catalog.get(self.catalog_attr, int(pk))
+        except KeyError:
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def conditional(self, handler, request, *args, **kwargs):
+        etag = quote_etag(catalog.load().version)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+
+class IngredientViewSet(CatalogViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (IngredientFilter,)
-    search_fields = ('^name',)
+    catalog_attr = 'ingredients'
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Tag.objects.all()
+class TagViewSet(CatalogViewSet):
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    catalog_attr = 'tags'
+
+    def get_queryset(self):
+        return sorted(
+            catalog.load().tags.values(), key=lambda tag: tag.name
+        )
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly,)
     pagination_class = StandartProjectPagination
+    keyset_ordering = ('-pub_date', '-id')
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        if self.request.method in permissions.SAFE_METHODS:
+            return Recipe.objects.with_related()
+        return Recipe.objects.all()
+
+    def get_validators(self, recipes, meta=None):
+        state = get_user_state(self.request)
+        key = json.dumps((
+            catalog.load().version,
+            meta,
+            [
+                (
+                    recipe.id,
+                    recipe.updated_at.isoformat(),
+                    recipe.id in state.favorites,
+                    recipe.id in state.cart,
+                    recipe.author_id in state.following,
+                ) for recipe in recipes
+            ],
+        ))
+        etag = quote_etag(md5(key.encode()).hexdigest())
+        if self.request.user.is_authenticated or not recipes:
+            return etag, None
+        updated_at = max(recipe.updated_at for recipe in recipes)
+        return etag, timegm(updated_at.utctimetuple())
+
+    def conditional(self, recipes, handler, meta=None):
+        etag, last_modified = self.get_validators(recipes, meta)
+        response = get_conditional_response(
+            self.request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler()
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list_recipes(self, request):
+        recipes = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        return self.conditional(
+            recipes,
+            lambda: self.get_paginated_response(
+                self.get_serializer(recipes, many=True).data
+            ),
+            meta=self.get_paginated_response([]).data,
+        )
+
+    def retrieve_recipe(self, request, *args, **kwargs):
+        recipe = self.get_object()
+        return self.conditional(
+            (recipe,),
+            lambda: Response(self.get_serializer(recipe).data)
+        )
+
+    def list(self, request, *args, **kwargs):
+        return recipe_response_cache.fetch(request, self.list_recipes)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if pk.isdigit():
+            activity.add('views', (int(pk),))
+        return recipe_response_cache.fetch(
+            request, self.retrieve_recipe, *args, **kwargs
+        )
+
     def get_serializer_class(self):
         if self.request.method in permissions.SAFE_METHODS:
             return RecipeSerializer
@@ -53,13 +179,21 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def add_del_to_favorite(self, request, pk):
         user = request.user
         recipe = get_object_or_404(Recipe, id=pk)
-        fav_recipe, is_fav = FavoriteRecipe.objects.get_or_create(
-            author=user,
-            recipe=recipe
-        )
+        with transaction.atomic():
+            fav_recipe, is_fav = FavoriteRecipe.objects.get_or_create(
+                author=user,
+                recipe=recipe
+            )
+            if not is_fav:
+                fav_recipe.delete()
+            Recipe.objects.filter(id=recipe.id).change_counter(
+                'favorites_count', 1 if is_fav else -1
+            )
         if not is_fav:
-            fav_recipe.delete()
+            update_user_state(request, 'favorites', removed=(recipe.id,))
             return Response(status=status.HTTP_204_NO_CONTENT)
+        activity.add('favorites', (recipe.id,))
+        update_user_state(request, 'favorites', added=(recipe.id,))
         serializer = ViewRecipeSerializer(recipe)
         return Response(
             serializer.data,
@@ -76,10 +210,17 @@ class RecipeViewSet(viewsets.ModelViewSet):
         user = request.user
         recipe = get_object_or_404(Recipe, id=pk)
         if request.method == 'POST':
-            shopping_list = ShoppingList.objects.create(
-                user=user,
-                recipe=recipe
-            )
+            with transaction.atomic():
+                shopping_list = ShoppingList.objects.create(
+                    user=user,
+                    recipe=recipe
+                )
+                ShoppingListIngredient.objects.add_recipes(user, (recipe.id,))
+                Recipe.objects.filter(id=recipe.id).change_counter(
+                    'cart_count', 1
+                )
+            update_user_state(request, 'cart', added=(recipe.id,))
+            activity.add('carts', (recipe.id,))
             serializer = ShoppingListSerializer(shopping_list)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         shopping_list = get_object_or_404(
@@ -87,9 +228,177 @@ class RecipeViewSet(viewsets.ModelViewSet):
             user=user,
             recipe=recipe
         )
-        shopping_list.delete()
+        with transaction.atomic():
+            shopping_list.delete()
+            ShoppingListIngredient.objects.remove_recipes(user, (recipe.id,))
+            Recipe.objects.filter(id=recipe.id).change_counter(
+                'cart_count', -1
+            )
+        update_user_state(request, 'cart', removed=(recipe.id,))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def batch_update(self, request, model, user_field, state_name):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+        user = request.user
+        with transaction.atomic():
+            current = model.objects.filter(
+                **{user_field: user}, recipe_id__in=recipe_ids
+            )
+            current_ids = set(current.values_list('recipe_id', flat=True))
+            if request.method == 'POST':
+                found_ids = set(
+                    Recipe.objects.filter(id__in=recipe_ids).values_list(
+                        'id', flat=True
+                    )
+                )
+                changed_ids = found_ids - current_ids
+                model.objects.bulk_create(
+                    (
+                        model(**{user_field: user}, recipe_id=recipe_id)
+                        for recipe_id in changed_ids
+                    ),
+                    ignore_conflicts=True
+                )
+                results = [
+                    {
+                        'id': recipe_id,
+                        'status': (
+                            'created' if recipe_id in changed_ids
+                            else 'exists' if recipe_id in current_ids
+                            else 'not_found'
+                        ),
+                    } for recipe_id in recipe_ids
+                ]
+            else:
+                changed_ids = current_ids
+                current.delete()
+                results = [
+                    {
+                        'id': recipe_id,
+                        'status': (
+                            'deleted' if recipe_id in changed_ids
+                            else 'not_found'
+                        ),
+                    } for recipe_id in recipe_ids
+                ]
+            sign = 1 if request.method == 'POST' else -1
+            if model is ShoppingList:
+                ShoppingListIngredient.objects.add_recipes(
+                    user, changed_ids, sign=sign
+                )
+            Recipe.objects.filter(id__in=changed_ids).change_counter(
+                POPULARITY_COUNTERS[model], sign
+            )
+            if request.method == 'POST':
+                update_user_state(request, state_name, added=changed_ids)
+                activity.add(ACTIVITY_FIELDS[model], changed_ids)
+            else:
+                update_user_state(request, state_name, removed=changed_ids)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(
+        methods=('POST', 'DELETE'),
+        detail=False,
+        url_path='favorite/batch',
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def batch_favorite(self, request):
+        return self.batch_update(
+            request, FavoriteRecipe, 'author', 'favorites'
+        )
+
+    @action(
+        methods=('POST', 'DELETE'),
+        detail=False,
+        url_path='shopping_cart/batch',
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def batch_shopping_list(self, request):
+        return self.batch_update(request, ShoppingList, 'user', 'cart')
+
+    @action(
+        methods=('GET',),
+        detail=False,
+        url_path='search',
+    )
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'q': 'Введите поисковый запрос.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        page = self.paginate_queryset(
+            search_recipes(self.filter_queryset(self.get_queryset()), query)
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=('GET',),
+        detail=False,
+        url_path='feed',
+        permission_classes=(permissions.IsAuthenticated,),
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=('GET',),
+        detail=False,
+        url_path='trending',
+    )
+    def trending(self, request):
+        page = self.paginate_queryset(
+            self.get_queryset().filter(
+                trending__isnull=False
+            ).order_by('trending__rank')
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=('GET',),
+        detail=False,
+        url_path='match',
+    )
+    def match(self, request):
+        data = {
+            'ingredients': [
+                value
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',') if value
+            ],
+        }
+        if 'max_missing' in request.query_params:
+            data['max_missing'] = request.query_params['max_missing']
+        serializer = IngredientMatchSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        page = self.paginate_queryset(match_index.load().match(
+            serializer.validated_data['ingredients'],
+            serializer.validated_data.get('max_missing')
+        ))
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        results = []
+        for recipe_id, matched, missing in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.matched_ingredients = matched
+                recipe.missing_ingredients = missing
+                results.append(recipe)
+        return self.get_paginated_response(
+            RecipeMatchSerializer(
+                results, many=True, context=self.get_serializer_context()
+            ).data
+        )
+
     @action(
         methods=('GET',),
         detail=False,
@@ -98,20 +407,36 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def download_shopping_list(self, request):
         user = request.user
-        timestamp = datetime.now().strftime('%d%m%Y%H%M')
-        if user.shopping_list.exists():
-            items = (
-                IngredientList.objects.filter(
-                    recipe__shopping_list__user=user
-                ).values(
-                    'ingredient__name',
-                    'ingredient__measurement_unit'
-                ).annotate(amount=Sum('amount'))
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {'file_format': (
+                    'Доступные форматы: '
+                    f'{", ".join(SHOPPING_LIST_FORMATS)}'
+                )},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            text = make_shopping_list(items, user)
-            filename = f'{user}_{timestamp}_shopping_list.txt'
-            response = HttpResponse(text, content_type='text/plain')
-            response['Content-Disposition'] = (
-                f'attachment; filename="{filename}"')
-            return response
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        writer, content_type = SHOPPING_LIST_FORMATS[file_format]
+        items = (
+            ShoppingListIngredient.objects.filter(
+                user=user
+            ).values(
+                'ingredient__name',
+                'ingredient__measurement_unit',
+                'amount'
+            ).order_by('ingredient__name').iterator(
+                chunk_size=SHOPPING_LIST_CHUNK_SIZE
+            )
+        )
+        first_item = next(items, None)
+        if first_item is None:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        timestamp = datetime.now().strftime('%d%m%Y%H%M')
+        filename = f'{user}_{timestamp}_shopping_list.{file_format}'
+        response = StreamingHttpResponse(
+            writer(chain((first_item,), items), user),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{filename}"')
+        return response
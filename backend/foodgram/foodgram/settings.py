@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'colorfield',
@@ -76,6 +77,16 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -117,10 +128,80 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
 }
 
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', default=300))
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', default=1000))
+
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', default=15)
+)
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(
+    os.getenv('PAGINATION_COUNT_ESTIMATE_THRESHOLD', default=100000)
+)
+
+RECIPE_SEARCH_CONFIG = 'russian'
+
+INGREDIENT_MATCH_CHECK_INTERVAL = float(
+    os.getenv('INGREDIENT_MATCH_CHECK_INTERVAL', default=60)
+)
+INGREDIENT_MATCH_DELTA_TIMEOUT = int(
+    os.getenv('INGREDIENT_MATCH_DELTA_TIMEOUT', default=3600)
+)
+INGREDIENT_MATCH_MAX_DELTAS = int(
+    os.getenv('INGREDIENT_MATCH_MAX_DELTAS', default=1000)
+)
+INGREDIENT_MATCH_BUILD_WAIT = float(
+    os.getenv('INGREDIENT_MATCH_BUILD_WAIT', default=30)
+)
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', default=50))
+
+CATALOG_VERSION_CHECK_INTERVAL = float(
+    os.getenv('CATALOG_VERSION_CHECK_INTERVAL', default=1)
+)
+
+USER_STATE_CACHE_TIMEOUT = int(
+    os.getenv('USER_STATE_CACHE_TIMEOUT', default=300)
+)
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=60))
+RESPONSE_CACHE_STALE_TIMEOUT = int(
+    os.getenv('RESPONSE_CACHE_STALE_TIMEOUT', default=300)
+)
+RESPONSE_CACHE_LOCK_TIMEOUT = int(
+    os.getenv('RESPONSE_CACHE_LOCK_TIMEOUT', default=10)
+)
+RESPONSE_CACHE_LOCK_WAIT = float(
+    os.getenv('RESPONSE_CACHE_LOCK_WAIT', default=2)
+)
+
+ACTIVITY_FLUSH_INTERVAL = float(
+    os.getenv('ACTIVITY_FLUSH_INTERVAL', default=10)
+)
+TRENDING_WINDOW_HOURS = int(os.getenv('TRENDING_WINDOW_HOURS', default=72))
+TRENDING_HALF_LIFE_HOURS = float(
+    os.getenv('TRENDING_HALF_LIFE_HOURS', default=24)
+)
+TRENDING_SIZE = int(os.getenv('TRENDING_SIZE', default=1000))
+TRENDING_WEIGHTS = {'views': 1, 'carts': 3, 'favorites': 5}
+
+FEED_MAX_LENGTH = int(os.getenv('FEED_MAX_LENGTH', default=500))
+FEED_FANOUT_MAX_FOLLOWERS = int(
+    os.getenv('FEED_FANOUT_MAX_FOLLOWERS', default=1000)
+)
+FEED_FANOUT_BATCH_SIZE = int(
+    os.getenv('FEED_FANOUT_BATCH_SIZE', default=1000)
+)
+
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', default=2))
+BACKGROUND_TASKS_EAGER = os.getenv('BACKGROUND_TASKS_EAGER') == 'True'
+
+RECIPE_IMAGE_WIDTHS = (320, 640, 1280)
+RECIPE_IMAGE_QUALITY = 80
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -0,0 +1,65 @@
+import atexit
+from collections import Counter, defaultdict
+from threading import Lock, Timer
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from recipes import tasks
+from recipes.models import RecipeActivity
+
+
+def flush_activity(hour, counts):
+    RecipeActivity.objects.record(hour, counts)
+
+
+def new_counts():
+    return defaultdict(lambda: defaultdict(Counter))
+
+
+class ActivityBuffer:
+    def __init__(self):
+        self.lock = Lock()
+        self.counts = new_counts()
+        self.timer = None
+
+    def add(self, field, recipe_ids):
+        if not recipe_ids:
+            return
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+        with self.lock:
+            for recipe_id in recipe_ids:
+                self.counts[hour][recipe_id][field] += 1
+            interval = settings.ACTIVITY_FLUSH_INTERVAL
+            if interval > 0 and self.timer is None:
+                self.timer = Timer(interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+        if interval <= 0:
+            self.flush()
+
+    def take(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            counts, self.counts = self.counts, new_counts()
+        return {hour: dict(hourly) for hour, hourly in counts.items()}
+
+    def flush(self):
+        for hour, counts in self.take().items():
+            tasks.submit(flush_activity, hour, counts)
+
+    def flush_at_exit(self):
+        counts = self.take()
+        if not counts:
+            return
+        try:
+            for hour, hourly in counts.items():
+                flush_activity(hour, hourly)
+        finally:
+            connections.close_all()
+
+
+activity = ActivityBuffer()
+atexit.register(activity.flush_at_exit)
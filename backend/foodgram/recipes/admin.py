@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.db import transaction
+from recipes.matching import match_index
 from recipes.models import (FavoriteRecipe, Ingredient, IngredientList, Recipe,
-                            ShoppingList, Tag)
+                            ShoppingList, ShoppingListIngredient, Tag,
+                            TrendingRecipe)
 
 EMPTY_VAL = '-empty-'
 
@@ -31,15 +34,14 @@ class RecipeAdmin(admin.ModelAdmin):
         'text',
         'cooking_time',
         'pub_date',
-        'favorites_count'
+        'favorites_count',
+        'cart_count',
     )
     search_fields = ('name',)
     list_filter = ('author', 'name', 'tags')
+    list_select_related = ('author',)
     empty_value_display = EMPTY_VAL
 
-    def favorites_count(self, obj):
-        return FavoriteRecipe.objects.filter(recipe=obj).count()
-
 
 @admin.register(FavoriteRecipe)
 class FavoriteRecipeAdmin(admin.ModelAdmin):
@@ -56,6 +58,18 @@ class IngredientListAdmin(admin.ModelAdmin):
     list_filter = ('recipe',)
     empty_value_display = EMPTY_VAL
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        transaction.on_commit(match_index.invalidate)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        transaction.on_commit(match_index.invalidate)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        transaction.on_commit(match_index.invalidate)
+
 
 @admin.register(ShoppingList)
 class ShoppingListAdmin(admin.ModelAdmin):
@@ -63,3 +77,18 @@ class ShoppingListAdmin(admin.ModelAdmin):
     search_fields = ('recipe', 'user')
     list_filter = ('recipe', 'user')
     empty_value_display = EMPTY_VAL
+
+
+@admin.register(ShoppingListIngredient)
+class ShoppingListIngredientAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'ingredient', 'amount')
+    list_select_related = ('user', 'ingredient')
+    search_fields = ('user__username', 'ingredient__name')
+    empty_value_display = EMPTY_VAL
+
+
+@admin.register(TrendingRecipe)
+class TrendingRecipeAdmin(admin.ModelAdmin):
+    list_display = ('rank', 'recipe', 'score')
+    list_select_related = ('recipe',)
+    empty_value_display = EMPTY_VAL
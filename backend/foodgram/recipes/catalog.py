@@ -0,0 +1,81 @@
+from bisect import bisect_left
+from threading import Lock
+from time import monotonic
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from recipes.models import Ingredient, Tag
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_MODELS = {'tags': Tag, 'ingredients': Ingredient}
+
+
+class Catalog:
+    def __init__(self):
+        self.lock = Lock()
+        self.version = None
+        self.checked_at = None
+        self.tags = {}
+        self.ingredients = {}
+        self.ingredient_names = []
+
+    def get_version(self):
+        cache.add(CATALOG_VERSION_KEY, uuid4().hex, None)
+        return cache.get(CATALOG_VERSION_KEY)
+
+    def load(self):
+        if self.version is not None and (
+            monotonic() - self.checked_at
+            < settings.CATALOG_VERSION_CHECK_INTERVAL
+        ):
+            return self
+        version = self.get_version()
+        with self.lock:
+            self.checked_at = monotonic()
+            if self.version != version:
+                self.tags = {tag.id: tag for tag in Tag.objects.all()}
+                self.ingredients = {
+                    ingredient.id: ingredient
+                    for ingredient in Ingredient.objects.all()
+                }
+                self.ingredient_names = sorted(
+                    (ingredient.name.lower(), ingredient.id)
+                    for ingredient in self.ingredients.values()
+                )
+                self.version = version
+        return self
+
+    def get(self, attr, pk):
+        items = getattr(self.load(), attr)
+        if pk in items:
+            return items[pk]
+        item = CATALOG_MODELS[attr].objects.filter(pk=pk).first()
+        if item is None:
+            raise KeyError(pk)
+        items[pk] = item
+        return item
+
+    def invalidate(self):
+        cache.set(CATALOG_VERSION_KEY, uuid4().hex, None)
+        self.version = None
+
+    def search_ingredients(self, term, limit):
+        term = term.lower()
+        names = self.ingredient_names
+        result = []
+        for name, ingredient_id in names[bisect_left(names, (term,)):]:
+            if len(result) >= limit or not name.startswith(term):
+                break
+            result.append(self.ingredients[ingredient_id])
+        if not term:
+            return result
+        for name, ingredient_id in names:
+            if len(result) >= limit:
+                break
+            if term in name and not name.startswith(term):
+                result.append(self.ingredients[ingredient_id])
+        return result
+
+
+catalog = Catalog()
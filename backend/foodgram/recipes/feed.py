@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow
+
+
+def has_many_followers(follows):
+    return follows[settings.FEED_FANOUT_MAX_FOLLOWERS:]
+
+
+def pulled_authors(user):
+    return Follow.objects.filter(user=user).filter(Exists(
+        has_many_followers(Follow.objects.filter(author=OuterRef('author')))
+    )).values('author')
+
+
+def fan_out_recipe(recipe_id):
+    recipe = Recipe.objects.filter(id=recipe_id).values_list(
+        'id', 'author_id', 'pub_date'
+    ).first()
+    if recipe is None:
+        return
+    followers = Follow.objects.filter(author_id=recipe[1])
+    if has_many_followers(followers).exists():
+        return
+    user_ids = list(followers.values_list('user_id', flat=True))
+    batch_size = settings.FEED_FANOUT_BATCH_SIZE
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        FeedEntry.objects.push(batch, (recipe,))
+        FeedEntry.objects.trim(batch, settings.FEED_MAX_LENGTH)
+
+
+def backfill_feed(user_id, author_id):
+    if has_many_followers(Follow.objects.filter(author_id=author_id)).exists():
+        return
+    FeedEntry.objects.push((user_id,), Recipe.objects.filter(
+        author_id=author_id
+    ).order_by('-pub_date', '-id').values_list(
+        'id', 'author_id', 'pub_date'
+    )[:settings.FEED_MAX_LENGTH])
+    FeedEntry.objects.trim((user_id,), settings.FEED_MAX_LENGTH)
+
+
+def remove_from_feed(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild_feeds(user_ids=None):
+    follows = Follow.objects.order_by('user_id', 'author_id')
+    if user_ids is not None:
+        follows = follows.filter(user_id__in=user_ids)
+    FeedEntry.objects.filter(
+        **({} if user_ids is None else {'user_id__in': user_ids})
+    ).delete()
+    for user_id, author_id in follows.values_list(
+        'user_id', 'author_id'
+    ).iterator():
+        backfill_feed(user_id, author_id)
+
+
+def newer_than(position, id_field):
+    if position is None:
+        return Q()
+    pub_date, recipe_id = position
+    return Q(pub_date__lt=pub_date) | Q(
+        pub_date=pub_date, **{f'{id_field}__lt': recipe_id}
+    )
+
+
+def feed_recipes(queryset, user, position, limit):
+    candidates = set(
+        FeedEntry.objects.filter(
+            newer_than(position, 'recipe_id'), user=user
+        ).order_by('-pub_date', '-recipe_id').values_list(
+            'pub_date', 'recipe_id'
+        )[:limit]
+    )
+    author_ids = list(pulled_authors(user).values_list('author', flat=True))
+    if author_ids:
+        candidates.update(
+            Recipe.objects.filter(
+                newer_than(position, 'id'), author__in=author_ids
+            ).order_by('-pub_date', '-id').values_list(
+                'pub_date', 'id'
+            )[:limit]
+        )
+    recipe_ids = [
+        recipe_id for _, recipe_id in sorted(candidates, reverse=True)
+    ][:limit]
+    recipes = queryset.in_bulk(recipe_ids)
+    return [
+        recipes[recipe_id] for recipe_id in recipe_ids if recipe_id in recipes
+    ]
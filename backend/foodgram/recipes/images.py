@@ -0,0 +1,84 @@
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'media/images/variants'
+ORIGINAL_FORMATS = ('JPEG', 'PNG', 'WEBP')
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+
+
+def get_widths(original_width):
+    widths = {
+        width for width in settings.RECIPE_IMAGE_WIDTHS
+        if width < original_width
+    }
+    widths.add(min(original_width, max(settings.RECIPE_IMAGE_WIDTHS)))
+    return sorted(widths)
+
+
+def encode(image, image_format):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=settings.RECIPE_IMAGE_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def has_metadata(image):
+    return bool(
+        image.getexif() or getattr(image, 'text', None)
+        or any(key in image.info for key in METADATA_KEYS)
+    )
+
+
+def save_original(image, image_format, name, storage):
+    if image_format not in ORIGINAL_FORMATS:
+        image_format = 'PNG'
+        name = f'{os.path.splitext(name)[0]}.png'
+    return storage.save(name, encode(image, image_format))
+
+
+def process_recipe_image(recipe_id):
+    recipe = Recipe.objects.filter(id=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return
+    original_name = name = recipe.image.name
+    storage = recipe.image.storage
+    try:
+        with storage.open(name, 'rb') as file:
+            image = Image.open(file)
+            image.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.warning('Не удалось обработать картинку %s', name)
+        return
+    image_format = image.format
+    metadata = has_metadata(image)
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    if metadata:
+        name = save_original(image, image_format, name, storage)
+    stem = os.path.splitext(os.path.basename(name))[0]
+    variants = {'webp': {}, 'jpeg': {}}
+    for width in get_widths(image.width):
+        resized = image.copy()
+        resized.thumbnail((width, image.height), Image.LANCZOS)
+        for image_format, extension in (('WEBP', 'webp'), ('JPEG', 'jpg')):
+            variants[image_format.lower()][str(width)] = storage.save(
+                f'{VARIANTS_DIR}/{stem}_{width}.{extension}',
+                encode(resized, image_format)
+            )
+    Recipe.objects.filter(id=recipe_id, image=original_name).update(
+        image=name,
+        image_variants=variants,
+        updated_at=timezone.now()
+    )
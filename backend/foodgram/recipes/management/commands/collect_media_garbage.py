@@ -0,0 +1,64 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы картинок, на которые не ссылается ни один рецепт.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Не трогать файлы моложе указанного числа секунд'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы, которые будут удалены'
+        )
+
+    def walk(self, storage, path):
+        directories, files = storage.listdir(path)
+        for name in files:
+            yield posixpath.join(path, name)
+        for directory in directories:
+            yield from self.walk(storage, posixpath.join(path, directory))
+
+    def get_referenced(self):
+        referenced = set()
+        recipes = Recipe.objects.values_list('image', 'image_variants')
+        for image, variants in recipes.iterator():
+            referenced.add(image)
+            for names in (variants or {}).values():
+                referenced.update(names.values())
+        return referenced
+
+    def handle(self, *args, **options):
+        field = Recipe._meta.get_field('image')
+        storage = field.storage
+        root = field.upload_to.rstrip('/')
+        if not storage.exists(root):
+            return
+        threshold = timezone.now() - timedelta(seconds=options['min_age'])
+        referenced = self.get_referenced()
+        candidates = [
+            name for name in self.walk(storage, root)
+            if name not in referenced
+            and storage.get_modified_time(name) <= threshold
+        ]
+        if candidates:
+            referenced = self.get_referenced()
+        removed = 0
+        for name in candidates:
+            if name in referenced or (
+                storage.get_modified_time(name) > threshold
+            ):
+                continue
+            self.stdout.write(f'- {name}')
+            if not options['dry_run']:
+                storage.delete(name)
+            removed += 1
+        message = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'{message} файлов: {removed}.'))
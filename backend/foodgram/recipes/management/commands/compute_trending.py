@@ -0,0 +1,55 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from recipes.models import ACTIVITY_FIELDS, RecipeActivity, TrendingRecipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг популярных рецептов по просмотрам, '
+        'избранному и спискам покупок с экспоненциальным затуханием.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size', type=int, default=settings.TRENDING_SIZE,
+            help='Сколько рецептов сохранить в рейтинге'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        window_start = now - timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+        weights = settings.TRENDING_WEIGHTS
+        scores = defaultdict(float)
+        rows = RecipeActivity.objects.filter(
+            hour__gte=window_start
+        ).values_list('recipe_id', 'hour', *ACTIVITY_FIELDS)
+        for recipe_id, hour, *counts in rows.iterator():
+            age = (now - hour).total_seconds() / 3600
+            scores[recipe_id] += 0.5 ** (
+                age / settings.TRENDING_HALF_LIFE_HOURS
+            ) * sum(
+                weights[field] * count
+                for field, count in zip(ACTIVITY_FIELDS, counts)
+            )
+        top = heapq.nlargest(
+            options['size'], scores.items(), key=lambda item: item[::-1]
+        )
+        with transaction.atomic():
+            TrendingRecipe.objects.all().delete()
+            TrendingRecipe.objects.bulk_create(
+                TrendingRecipe(recipe_id=recipe_id, rank=rank, score=score)
+                for rank, (recipe_id, score) in enumerate(top, 1)
+            )
+        removed, _ = RecipeActivity.objects.filter(
+            hour__lt=window_start
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'В рейтинге рецептов: {len(top)}, '
+            f'удалено старых записей активности: {removed}.'
+        ))
@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand
+from django.db.models import Prefetch
+from recipes.models import IngredientList, Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает рецепты в формате JSON Lines (один рецепт на строку) '
+        'и при необходимости копирует картинки в отдельный каталог.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--media-dir', help='Каталог, куда скопировать картинки'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=8)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_list',
+                queryset=IngredientList.objects.select_related('ingredient')
+            ),
+        ).order_by('id')
+        media_dir = options['media_dir']
+        exported = 0
+        last_id = 0
+        with open(options['path'], 'w', encoding='utf-8') as file, (
+            ThreadPoolExecutor(options['workers'])
+        ) as executor:
+            while True:
+                batch = list(
+                    recipes.filter(id__gt=last_id)[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                for recipe in batch:
+                    file.write(
+                        json.dumps(self.serialize(recipe), ensure_ascii=False)
+                        + '\n'
+                    )
+                if media_dir:
+                    list(executor.map(
+                        lambda name: self.copy_image(name, media_dir),
+                        [recipe.image.name for recipe in batch]
+                    ))
+                exported += len(batch)
+        self.stdout.write(
+            self.style.SUCCESS(f'Выгружено рецептов: {exported}.')
+        )
+
+    def serialize(self, recipe):
+        author = recipe.author
+        return {
+            'author': {
+                'email': author.email,
+                'username': author.username,
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+            },
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'pub_date': recipe.pub_date.isoformat(),
+            'image': recipe.image.name,
+            'tags': [
+                {'name': tag.name, 'color': tag.color, 'slug': tag.slug}
+                for tag in recipe.tags.all()
+            ],
+            'ingredients': [
+                {
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                } for item in recipe.ingredient_list.all()
+            ],
+        }
+
+    def copy_image(self, name, media_dir):
+        if not name or not default_storage.exists(name):
+            return
+        target = os.path.join(media_dir, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with default_storage.open(name) as source, open(
+            target, 'wb'
+        ) as destination:
+            shutil.copyfileobj(source, destination)
@@ -0,0 +1,215 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.files import File
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from recipes.catalog import catalog
+from recipes.matching import match_index
+from recipes.models import (ImportCheckpoint, Ingredient, IngredientList,
+                            Recipe, Tag)
+from recipes.search import update_search_vectors
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает рецепты из файла JSON Lines, созданного командой '
+        'export_recipes. Загрузка идет пачками; номер последней загруженной '
+        'строки сохраняется в базе в той же транзакции, что и пачка, '
+        'поэтому прерванную загрузку можно продолжить повторным запуском. '
+        'Одинаковые картинки хранятся в одном файле.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--media-dir', help='Каталог, из которого копировать картинки'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument(
+            '--checkpoint',
+            help='Ключ контрольной точки (по умолчанию полный путь к файлу)'
+        )
+
+    def handle(self, *args, **options):
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            path=options['checkpoint'] or os.path.abspath(options['path'])
+        )
+        done = checkpoint.line
+        if done:
+            self.stdout.write(f'Продолжение с строки {done + 1}.')
+        with open(options['path'], encoding='utf-8') as file, (
+            ThreadPoolExecutor(options['workers'])
+        ) as executor:
+            lines = islice(file, done, None)
+            while True:
+                chunk = list(islice(lines, options['batch_size']))
+                if not chunk:
+                    break
+                batch = [json.loads(line) for line in chunk if line.strip()]
+                images = list(executor.map(
+                    lambda item: self.copy_image(
+                        item.get('image', ''), options['media_dir']
+                    ),
+                    batch
+                ))
+                done += len(chunk)
+                with transaction.atomic():
+                    self.load_batch(batch, images)
+                    ImportCheckpoint.objects.filter(
+                        pk=checkpoint.pk
+                    ).update(line=done)
+                    transaction.on_commit(catalog.invalidate)
+                self.stdout.write(f'Загружено строк: {done}')
+        match_index.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Загрузка завершена, строк: {done}.'
+        ))
+
+    def copy_image(self, name, media_dir):
+        if not media_dir or not name:
+            return name
+        source = os.path.join(media_dir, name)
+        if not os.path.exists(source):
+            return name
+        with open(source, 'rb') as file:
+            return Recipe._meta.get_field('image').storage.save(
+                name, File(file)
+            )
+
+    def load_batch(self, batch, images):
+        try:
+            authors = self.resolve_authors(batch)
+            tags = self.resolve_tags(batch)
+            ingredients = self.resolve_ingredients(batch)
+            rows = [
+                (
+                    Recipe(
+                        author=self.lookup(
+                            authors, item['author']['email'], 'автор'
+                        ),
+                        name=item['name'],
+                        text=item['text'],
+                        cooking_time=item['cooking_time'],
+                        image=image,
+                    ),
+                    [
+                        self.lookup(tags, tag['slug'], 'тег')
+                        for tag in item.get('tags', ())
+                    ],
+                    [
+                        (
+                            self.lookup(
+                                ingredients, ingredient['name'], 'ингредиент'
+                            ),
+                            ingredient['amount'],
+                        ) for ingredient in item.get('ingredients', ())
+                    ],
+                    parse_datetime(item.get('pub_date') or ''),
+                ) for item, image in zip(batch, images)
+            ]
+        except KeyError as error:
+            raise CommandError(f'В строке нет поля {error}')
+        if not rows:
+            return
+        recipes = [recipe for recipe, _, _, _ in rows]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+        else:
+            for recipe in recipes:
+                recipe.save()
+        for recipe, _, _, pub_date in rows:
+            recipe.pub_date = pub_date or recipe.pub_date
+        Recipe.objects.bulk_update(recipes, ('pub_date',))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+            for recipe, tag_ids, _, _ in rows
+            for tag_id in tag_ids
+        )
+        IngredientList.objects.bulk_create(
+            IngredientList(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient_id,
+                amount=amount,
+            )
+            for recipe, _, recipe_ingredients, _ in rows
+            for ingredient_id, amount in recipe_ingredients
+        )
+        update_search_vectors([recipe.id for recipe in recipes])
+
+    def lookup(self, items, key, kind):
+        if key not in items:
+            raise CommandError(f'Не удалось найти или создать {kind} {key}')
+        return items[key]
+
+    def resolve_authors(self, batch):
+        authors = {item['author']['email']: item['author'] for item in batch}
+        existing = {
+            user.email: user
+            for user in User.objects.filter(email__in=authors)
+        }
+        missing = [
+            User(
+                email=email,
+                username=data['username'],
+                first_name=data.get('first_name', ''),
+                last_name=data.get('last_name', ''),
+                password='!',
+            )
+            for email, data in authors.items() if email not in existing
+        ]
+        if missing:
+            User.objects.bulk_create(missing, ignore_conflicts=True)
+            existing.update(
+                (user.email, user) for user in User.objects.filter(
+                    email__in=[user.email for user in missing]
+                )
+            )
+        return existing
+
+    def resolve_tags(self, batch):
+        tags = {
+            tag['slug']: tag for item in batch for tag in item.get('tags', ())
+        }
+        existing = dict(
+            Tag.objects.filter(slug__in=tags).values_list('slug', 'id')
+        )
+        missing = [
+            Tag(slug=slug, name=data['name'], color=data['color'])
+            for slug, data in tags.items() if slug not in existing
+        ]
+        if not missing:
+            return existing
+        Tag.objects.bulk_create(missing, ignore_conflicts=True)
+        return dict(
+            Tag.objects.filter(slug__in=tags).values_list('slug', 'id')
+        )
+
+    def resolve_ingredients(self, batch):
+        ingredients = {
+            ingredient['name']: ingredient['measurement_unit']
+            for item in batch for ingredient in item.get('ingredients', ())
+        }
+        existing = dict(
+            Ingredient.objects.filter(name__in=ingredients).values_list(
+                'name', 'id'
+            )
+        )
+        missing = [
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in ingredients.items()
+            if name not in existing
+        ]
+        if not missing:
+            return existing
+        Ingredient.objects.bulk_create(missing, ignore_conflicts=True)
+        return dict(
+            Ingredient.objects.filter(name__in=ingredients).values_list(
+                'name', 'id'
+            )
+        )
@@ -1,21 +1,147 @@
 import csv
+import json
+import os
+from itertools import islice
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from recipes.catalog import catalog
 from recipes.models import Ingredient
 
+READ_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file, delimiter=','):
+        if len(row) == 2:
+            yield row[0], row[1]
+        else:
+            yield None, None
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_SIZE).lstrip()
+    if buffer.startswith('['):
+        buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        while buffer.startswith(']') or not buffer:
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                return
+            buffer = (buffer.lstrip(']') + chunk).lstrip().lstrip(',')
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON.')
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        if isinstance(item, dict):
+            yield item.get('name'), item.get('measurement_unit')
+        else:
+            yield None, None
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
 
 class Command(BaseCommand):
-    def handle(self, *args, **kwargs):
-        file_path = f'{settings.BASE_DIR}/data/ingredients.csv'
-        with open(file_path, 'r', encoding='utf-8') as csv_file:
-            data = csv.reader(csv_file, delimiter=',')
-            for name, measurement_unit in data:
-                try:
-                    Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit
-                    )
-                except Exception:
-                    print(f'Ингредиент {name} уже добавлен')
-        self.stdout.write(self.style.SUCCESS('Данные загружены.'))
+    help = (
+        'Загружает ингредиенты из CSV (название, единицы измерения) или '
+        'JSON (массив или JSON Lines объектов с полями name и '
+        'measurement_unit). Существующие ингредиенты обновляются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+        )
+        parser.add_argument('--format', choices=READERS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Показать изменения, не сохраняя их'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path)[1][1:]
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        self.dry_run = options['dry_run']
+        self.counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        self.seen = set()
+        with open(path, 'r', encoding='utf-8') as file:
+            rows = READERS[file_format](file)
+            with transaction.atomic():
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+                    self.load_batch(batch)
+                if self.dry_run:
+                    transaction.set_rollback(True)
+                else:
+                    transaction.on_commit(catalog.invalidate)
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {self.counts["inserted"]}, '
+            f'обновлено: {self.counts["updated"]}, '
+            f'пропущено: {self.counts["skipped"]}.'
+            + (' Изменения не сохранены.' if self.dry_run else '')
+        ))
+
+    def load_batch(self, batch):
+        max_length = Ingredient._meta.get_field('name').max_length
+        rows = {}
+        for name, measurement_unit in batch:
+            name = (name or '').strip()
+            measurement_unit = (measurement_unit or '').strip()
+            if (
+                not name or not measurement_unit
+                or len(name) > max_length
+                or len(measurement_unit) > max_length
+                or name in self.seen
+            ):
+                self.counts['skipped'] += 1
+                continue
+            self.seen.add(name)
+            rows[name] = measurement_unit
+        existing = {
+            ingredient.name: ingredient
+            for ingredient in Ingredient.objects.filter(name__in=rows)
+        }
+        to_create, to_update = [], []
+        for name, measurement_unit in rows.items():
+            ingredient = existing.get(name)
+            if ingredient is None:
+                to_create.append(
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                )
+                self.report('+', f'{name}, {measurement_unit}')
+            elif ingredient.measurement_unit != measurement_unit:
+                self.report(
+                    '~',
+                    f'{name}, {ingredient.measurement_unit} -> '
+                    f'{measurement_unit}'
+                )
+                ingredient.measurement_unit = measurement_unit
+                to_update.append(ingredient)
+            else:
+                self.counts['skipped'] += 1
+        Ingredient.objects.bulk_create(to_create, ignore_conflicts=True)
+        Ingredient.objects.bulk_update(to_update, ('measurement_unit',))
+        self.counts['inserted'] += len(to_create)
+        self.counts['updated'] += len(to_update)
+
+    def report(self, sign, text):
+        if self.dry_run:
+            self.stdout.write(f'{sign} {text}')
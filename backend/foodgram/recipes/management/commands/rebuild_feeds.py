@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+from recipes.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = 'Заново заполняет ленты подписок пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, nargs='+',
+            help='Идентификаторы пользователей (по умолчанию все)'
+        )
+
+    def handle(self, *args, **options):
+        rebuild_feeds(options['users'])
+        self.stdout.write(self.style.SUCCESS('Ленты подписок обновлены.'))
@@ -0,0 +1,10 @@
+from django.core.management import BaseCommand
+from recipes.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поисковые векторы рецептов.'
+
+    def handle(self, *args, **options):
+        update_search_vectors()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс обновлен.'))
@@ -0,0 +1,53 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import ShoppingListIngredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает сводные списки покупок пользователей '
+        'или сверяет их с рецептами в корзине.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='id пользователя (можно указать несколько раз)'
+        )
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сверить данные, ничего не изменяя'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if not options['verify']:
+            with transaction.atomic():
+                ShoppingListIngredient.objects.rebuild(user_ids)
+            self.stdout.write(
+                self.style.SUCCESS('Списки покупок пересчитаны.')
+            )
+            return
+        stored = ShoppingListIngredient.objects.all()
+        if user_ids is not None:
+            stored = stored.filter(user__in=user_ids)
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in stored.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            )
+        }
+        live = ShoppingListIngredient.objects.live_totals(user_ids)
+        mismatches = sorted(
+            key for key in stored.keys() | live.keys()
+            if stored.get(key) != live.get(key)
+        )
+        for user_id, ingredient_id in mismatches:
+            self.stdout.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'сохранено {stored.get((user_id, ingredient_id), 0)}, '
+                f'ожидается {live.get((user_id, ingredient_id), 0)}'
+            )
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
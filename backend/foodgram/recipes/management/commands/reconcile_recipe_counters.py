@@ -0,0 +1,39 @@
+from django.core.management import BaseCommand
+from django.db.models import F
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счетчики избранного и списков покупок рецептов '
+        'с фактическими данными и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать количество расхождений'
+        )
+
+    def handle(self, *args, **options):
+        counters = Recipe.objects.popularity_counters()
+        stale_ids = list(
+            Recipe.objects.annotate(
+                actual_favorites=counters['favorites_count'],
+                actual_cart=counters['cart_count'],
+            ).exclude(
+                favorites_count=F('actual_favorites'),
+                cart_count=F('actual_cart'),
+            ).values_list('id', flat=True)
+        )
+        if not options['dry_run']:
+            batch_size = options['batch_size']
+            for start in range(0, len(stale_ids), batch_size):
+                Recipe.objects.filter(
+                    id__in=stale_ids[start:start + batch_size]
+                ).update(**counters)
+        message = 'Найдено' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{message} рецептов с неверными счетчиками: {len(stale_ids)}.'
+        ))
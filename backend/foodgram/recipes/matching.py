@@ -0,0 +1,189 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from threading import Event, Lock
+from time import monotonic
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from recipes import tasks
+from recipes.models import IngredientList
+
+MATCH_INDEX_VERSION_KEY = 'ingredient-match:version'
+MATCH_INDEX_SEQUENCE_KEY = 'ingredient-match:{}:sequence'
+MATCH_INDEX_DELTA_KEY = 'ingredient-match:{}:delta:{}'
+
+
+def apply_deltas(index, deltas):
+    postings, totals = index
+    postings = dict(postings)
+    totals = array('H', totals)
+    copied = set()
+
+    def change_posting(ingredient_id, recipe_id, present):
+        posting = postings.get(ingredient_id, ())
+        position = bisect_left(posting, recipe_id)
+        found = position < len(posting) and posting[position] == recipe_id
+        if found == present:
+            return
+        if ingredient_id not in copied:
+            posting = postings[ingredient_id] = array('L', posting)
+            copied.add(ingredient_id)
+        if present:
+            posting.insert(position, recipe_id)
+        else:
+            del posting[position]
+
+    for delta in deltas:
+        for recipe_id, ingredient_ids, removed_ids in delta:
+            for ingredient_id in set(removed_ids) - set(ingredient_ids):
+                change_posting(ingredient_id, recipe_id, False)
+            for ingredient_id in ingredient_ids:
+                change_posting(ingredient_id, recipe_id, True)
+            if recipe_id >= len(totals):
+                totals.frombytes(bytes(2 * (recipe_id + 1 - len(totals))))
+            totals[recipe_id] = len(ingredient_ids)
+    return postings, totals
+
+
+class IngredientMatchIndex:
+    def __init__(self):
+        self.lock = Lock()
+        self.ready = Event()
+        self.building = False
+        self.version = None
+        self.sequence = 0
+        self.missing = None
+        self.checked_at = float('-inf')
+        self.index = ({}, array('H'))
+
+    def get_state(self):
+        cache.add(MATCH_INDEX_VERSION_KEY, uuid4().hex, None)
+        version = cache.get(MATCH_INDEX_VERSION_KEY)
+        key = MATCH_INDEX_SEQUENCE_KEY.format(version)
+        cache.add(key, 0, None)
+        return version, cache.get(key)
+
+    def load(self):
+        if self.version is not None and (
+            monotonic() - self.checked_at
+            < settings.INGREDIENT_MATCH_CHECK_INTERVAL
+        ):
+            return self
+        version, sequence = self.get_state()
+        with self.lock:
+            self.checked_at = monotonic()
+            stale = self.version != version or self.sequence > sequence
+            if not stale and self.sequence < sequence:
+                stale = not self.apply_pending(sequence)
+            schedule = stale and not self.building
+            if schedule:
+                self.building = True
+        if schedule:
+            tasks.submit(self.rebuild)
+        if self.version is None:
+            self.ready.wait(settings.INGREDIENT_MATCH_BUILD_WAIT)
+        return self
+
+    def warm_up(self):
+        with self.lock:
+            if self.building or self.version is not None:
+                return
+            self.building = True
+        tasks.submit(self.rebuild)
+
+    def rebuild(self):
+        try:
+            version, sequence = self.get_state()
+            index = self.build()
+            with self.lock:
+                self.index = index
+                self.version = version
+                self.sequence = sequence
+                self.missing = None
+                self.checked_at = float('-inf')
+        finally:
+            self.building = False
+            self.ready.set()
+
+    def build(self):
+        postings = {}
+        totals = Counter()
+        rows = IngredientList.objects.order_by(
+            'ingredient_id', 'recipe_id'
+        ).values_list('ingredient_id', 'recipe_id').distinct()
+        for ingredient_id, recipe_id in rows.iterator():
+            if ingredient_id not in postings:
+                postings[ingredient_id] = array('L')
+            postings[ingredient_id].append(recipe_id)
+            totals[recipe_id] += 1
+        recipe_totals = array('H', bytes(2 * (max(totals, default=0) + 1)))
+        for recipe_id, total in totals.items():
+            recipe_totals[recipe_id] = total
+        return postings, recipe_totals
+
+    def apply_pending(self, sequence):
+        if sequence - self.sequence > settings.INGREDIENT_MATCH_MAX_DELTAS:
+            return False
+        keys = [
+            MATCH_INDEX_DELTA_KEY.format(self.version, number)
+            for number in range(self.sequence + 1, sequence + 1)
+        ]
+        deltas = cache.get_many(keys)
+        available = []
+        for key in keys:
+            if key not in deltas:
+                break
+            available.append(deltas[key])
+        missing = None
+        if len(available) < len(keys):
+            missing = self.sequence + len(available) + 1
+            if self.missing == missing:
+                return False
+        self.missing = missing
+        if not available:
+            return True
+        self.index = apply_deltas(self.index, available)
+        self.sequence += len(available)
+        return True
+
+    def publish(self, changes):
+        current = defaultdict(set)
+        for recipe_id, ingredient_id in IngredientList.objects.filter(
+            recipe_id__in=changes
+        ).values_list('recipe_id', 'ingredient_id'):
+            current[recipe_id].add(ingredient_id)
+        delta = [
+            (recipe_id, tuple(current[recipe_id]), tuple(removed_ids))
+            for recipe_id, removed_ids in changes.items()
+        ]
+        version, _ = self.get_state()
+        sequence = cache.incr(MATCH_INDEX_SEQUENCE_KEY.format(version))
+        cache.set(
+            MATCH_INDEX_DELTA_KEY.format(version, sequence),
+            delta,
+            settings.INGREDIENT_MATCH_DELTA_TIMEOUT
+        )
+
+    def invalidate(self):
+        cache.set(MATCH_INDEX_VERSION_KEY, uuid4().hex, None)
+
+    def match(self, ingredient_ids, max_missing=None):
+        postings, totals = self.index
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(postings.get(ingredient_id, ()))
+        result = [
+            (totals[recipe_id] - count, -count, -recipe_id)
+            for recipe_id, count in matched.items()
+            if max_missing is None or totals[recipe_id] - count <= max_missing
+        ]
+        result.sort()
+        return [
+            (-recipe_id, -count, missing)
+            for missing, count, recipe_id in result
+        ]
+
+
+match_index = IngredientMatchIndex()
@@ -1,8 +1,15 @@
+from collections import Counter
+
 from colorfield.fields import ColorField
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.functions import Coalesce, Greatest, RowNumber
+from recipes.storage import ContentAddressedStorage
 from users.models import User
 
+ACTIVITY_FIELDS = ('views', 'favorites', 'carts')
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -54,6 +61,54 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related('tags', 'ingredient_list')
+
+    def change_counter(self, field, delta):
+        return self.update(**{field: Greatest(models.F(field) + delta, 0)})
+
+    def popularity_counters(self):
+        return {
+            field: Coalesce(models.Subquery(
+                model.objects.filter(
+                    recipe=models.OuterRef('pk')
+                ).order_by().values('recipe').annotate(
+                    total=models.Count('pk')
+                ).values('total')
+            ), 0)
+            for field, model in (
+                ('favorites_count', FavoriteRecipe),
+                ('cart_count', ShoppingList),
+            )
+        }
+
+    def latest_by_author(self, author_ids, limit=None):
+        author_ids = list(author_ids)
+        result = {author_id: [] for author_id in author_ids}
+        if not author_ids:
+            return result
+        if limit is None:
+            recipes = self.filter(author__in=author_ids)
+        else:
+            placeholders = ', '.join(['%s'] * len(author_ids))
+            recipes = self.raw(
+                f'SELECT * FROM ('
+                f'SELECT *, ROW_NUMBER() OVER ('
+                f'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+                f') AS row_number FROM {self.model._meta.db_table} '
+                f'WHERE author_id IN ({placeholders})'
+                f') AS ranked WHERE row_number <= %s '
+                f'ORDER BY author_id, row_number',
+                (*author_ids, limit)
+            )
+        for recipe in recipes:
+            result[recipe.author_id].append(recipe)
+        return result
+
+
 class Recipe(models.Model):
     tags = models.ManyToManyField(
         Tag,
@@ -82,6 +137,12 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Ссылка на картинку на сайте',
         upload_to='media/images/',
+        storage=ContentAddressedStorage(),
+    )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Уменьшенные копии картинки',
     )
     text = models.TextField(
         verbose_name='Описание',
@@ -98,11 +159,50 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_favorites_count_idx'
+            ),
+            models.Index(
+                fields=('-cart_count', '-id'),
+                name='recipe_cart_count_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -160,6 +260,12 @@ class FavoriteRecipe(models.Model):
                 name='unique_favorite_recipe'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('author', 'recipe'),
+                name='favorite_author_recipe_idx'
+            ),
+        )
 
 
 class ShoppingList(models.Model):
@@ -185,3 +291,331 @@ class ShoppingList(models.Model):
                 name='unique_shopping_list'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('user', 'recipe'),
+                name='shopping_list_user_recipe_idx'
+            ),
+        )
+
+
+class ShoppingListIngredientManager(models.Manager):
+    def apply_changes(self, changes):
+        changes = {key: delta for key, delta in changes.items() if delta}
+        if not changes:
+            return
+        user_ids = {user_id for user_id, _ in changes}
+        list(
+            User.objects.select_for_update().filter(
+                pk__in=user_ids
+            ).order_by('pk').values_list('pk', flat=True)
+        )
+        existing = {
+            (row.user_id, row.ingredient_id): row
+            for row in self.filter(
+                user_id__in=user_ids,
+                ingredient_id__in={
+                    ingredient_id for _, ingredient_id in changes
+                },
+            )
+        }
+        to_create, to_update, to_delete = [], [], []
+        for (user_id, ingredient_id), delta in changes.items():
+            row = existing.get((user_id, ingredient_id))
+            if row is None:
+                if delta > 0:
+                    to_create.append(self.model(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=delta
+                    ))
+                continue
+            row.amount += delta
+            if row.amount > 0:
+                to_update.append(row)
+            else:
+                to_delete.append(row.id)
+        self.bulk_create(to_create)
+        self.bulk_update(to_update, ('amount',))
+        self.filter(id__in=to_delete).delete()
+
+    def add_recipes(self, user, recipe_ids, sign=1):
+        changes = Counter()
+        for ingredient_id, amount in IngredientList.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('ingredient_id', 'amount'):
+            changes[user.id, ingredient_id] += sign * amount
+        self.apply_changes(changes)
+
+    def remove_recipes(self, user, recipe_ids):
+        self.add_recipes(user, recipe_ids, sign=-1)
+
+    def change_recipe(self, recipe, ingredient_changes):
+        ingredient_changes = {
+            ingredient_id: delta
+            for ingredient_id, delta in ingredient_changes.items() if delta
+        }
+        if not ingredient_changes:
+            return
+        self.apply_changes({
+            (user_id, ingredient_id): delta
+            for user_id in ShoppingList.objects.filter(
+                recipe=recipe
+            ).values_list('user_id', flat=True)
+            for ingredient_id, delta in ingredient_changes.items()
+        })
+
+    def live_totals(self, user_ids=None):
+        items = IngredientList.objects.filter(
+            recipe__shopping_list__isnull=False
+        )
+        if user_ids is not None:
+            items = items.filter(recipe__shopping_list__user__in=user_ids)
+        return {
+            (item['recipe__shopping_list__user'], item['ingredient']):
+                item['total']
+            for item in items.values(
+                'recipe__shopping_list__user', 'ingredient'
+            ).annotate(total=models.Sum('amount')).order_by()
+        }
+
+    def rebuild(self, user_ids=None):
+        rows = self.all()
+        if user_ids is not None:
+            rows = rows.filter(user__in=user_ids)
+        rows.delete()
+        self.bulk_create(
+            (
+                self.model(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=total
+                )
+                for (user_id, ingredient_id), total in self.live_totals(
+                    user_ids
+                ).items()
+            ),
+            batch_size=1000
+        )
+
+
+class ShoppingListIngredient(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='shopping_list_ingredients'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+        related_name='shopping_list_ingredients'
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество ингредиента'
+    )
+
+    objects = ShoppingListIngredientManager()
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списков покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_ingredient'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.ingredient}: {self.amount}'
+
+
+class RecipeActivityManager(models.Manager):
+    def record(self, hour, counts):
+        recipe_ids = set(
+            Recipe.objects.filter(id__in=counts).values_list('id', flat=True)
+        )
+        if not recipe_ids:
+            return
+        with transaction.atomic(using=self.db):
+            self.bulk_create(
+                (
+                    self.model(recipe_id=recipe_id, hour=hour)
+                    for recipe_id in recipe_ids
+                ),
+                ignore_conflicts=True
+            )
+            rows = list(self.select_for_update().filter(
+                hour=hour, recipe_id__in=recipe_ids
+            ))
+            for row in rows:
+                for field, value in counts[row.recipe_id].items():
+                    setattr(row, field, getattr(row, field) + value)
+            self.bulk_update(rows, ACTIVITY_FIELDS)
+
+
+class RecipeActivity(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='activity'
+    )
+    hour = models.DateTimeField(verbose_name='Час')
+    views = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Просмотры'
+    )
+    favorites = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавления в избранное'
+    )
+    carts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавления в список покупок'
+    )
+
+    objects = RecipeActivityManager()
+
+    class Meta:
+        verbose_name = 'Активность по рецепту'
+        verbose_name_plural = 'Активность по рецептам'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'hour'),
+                name='unique_recipe_activity'
+            ),
+        )
+        indexes = (
+            models.Index(fields=('hour',), name='recipe_activity_hour_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.recipe}: {self.hour:%d.%m.%Y %H:00}'
+
+
+class TrendingRecipe(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Рецепт',
+        related_name='trending'
+    )
+    rank = models.PositiveIntegerField(
+        unique=True,
+        verbose_name='Место'
+    )
+    score = models.FloatField(verbose_name='Рейтинг')
+
+    class Meta:
+        ordering = ('rank',)
+        verbose_name = 'Популярный рецепт'
+        verbose_name_plural = 'Популярные рецепты'
+
+    def __str__(self):
+        return f'{self.rank}. {self.recipe}'
+
+
+class FeedEntryManager(models.Manager):
+    def push(self, user_ids, recipes):
+        self.bulk_create(
+            (
+                self.model(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=pub_date
+                )
+                for user_id in user_ids
+                for recipe_id, author_id, pub_date in recipes
+            ),
+            ignore_conflicts=True
+        )
+
+    def trim(self, user_ids, size):
+        ranked = self.filter(user_id__in=user_ids).annotate(
+            feed_rank=models.Window(
+                RowNumber(),
+                partition_by=(models.F('user_id'),),
+                order_by=(
+                    models.F('pub_date').desc(),
+                    models.F('recipe_id').desc(),
+                )
+            )
+        ).values('id', 'feed_rank')
+        sql, params = ranked.query.sql_with_params()
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN ('
+                f'SELECT id FROM ({sql}) ranked WHERE feed_rank > %s)',
+                (*params, size)
+            )
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик',
+        related_name='feed'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='feed_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='+'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    objects = FeedEntryManager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_user_author_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe}'
+
+
+class ImportCheckpoint(models.Model):
+    path = models.CharField(
+        max_length=500,
+        unique=True,
+        verbose_name='Файл загрузки'
+    )
+    line = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Загружено строк'
+    )
+
+    class Meta:
+        verbose_name = 'Контрольная точка загрузки'
+        verbose_name_plural = 'Контрольные точки загрузки'
+
+    def __str__(self):
+        return f'{self.path}: {self.line}'
@@ -0,0 +1,146 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock
+from time import monotonic
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.core.cache import cache
+from django.db import connection, models
+from recipes.models import IngredientList, Recipe
+
+SEARCH_INDEX_VERSION_KEY = 'recipe-search:version'
+TOKEN_RE = re.compile(r'\w+')
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2}
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def build_search_vector(recipe_ref='pk'):
+    config = settings.RECIPE_SEARCH_CONFIG
+    ingredient_names = IngredientList.objects.filter(
+        recipe=models.OuterRef(recipe_ref)
+    ).values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(
+            models.Subquery(ingredient_names), weight='B', config=config
+        )
+        + SearchVector('text', weight='C', config=config)
+    )
+
+
+def update_search_vectors(recipe_ids=None):
+    if connection.vendor != 'postgresql':
+        search_index.invalidate()
+        return
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(id__in=recipe_ids)
+    recipes.update(search_vector=build_search_vector())
+
+
+def search_recipes(queryset, query):
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(
+            query,
+            config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        queryset = queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(models.F('search_vector'), search_query)
+        )
+    else:
+        ranks = search_index.load().search(query)
+        if not ranks:
+            return queryset.none()
+        queryset = queryset.filter(id__in=ranks).annotate(
+            rank=models.Case(
+                *(
+                    models.When(id=recipe_id, then=models.Value(rank))
+                    for recipe_id, rank in ranks.items()
+                ),
+                output_field=models.FloatField()
+            )
+        )
+    return queryset.order_by('-rank', '-pub_date', '-id')
+
+
+class RecipeSearchIndex:
+    def __init__(self):
+        self.lock = Lock()
+        self.version = None
+        self.checked_at = None
+        self.postings = {}
+        self.terms = []
+
+    def get_version(self):
+        cache.add(SEARCH_INDEX_VERSION_KEY, uuid4().hex, None)
+        return cache.get(SEARCH_INDEX_VERSION_KEY)
+
+    def load(self):
+        if self.version is not None and (
+            monotonic() - self.checked_at
+            < settings.CATALOG_VERSION_CHECK_INTERVAL
+        ):
+            return self
+        version = self.get_version()
+        with self.lock:
+            self.checked_at = monotonic()
+            if self.version != version:
+                self.build()
+                self.version = version
+        return self
+
+    def build(self):
+        postings = defaultdict(lambda: defaultdict(float))
+        documents = Recipe.objects.values_list('id', 'name', 'text')
+        for recipe_id, name, text in documents.iterator():
+            for weight, value in (('A', name), ('C', text)):
+                for term in tokenize(value):
+                    postings[term][recipe_id] += WEIGHTS[weight]
+        ingredients = IngredientList.objects.values_list(
+            'recipe_id', 'ingredient__name'
+        )
+        for recipe_id, name in ingredients.iterator():
+            for term in tokenize(name):
+                postings[term][recipe_id] += WEIGHTS['B']
+        self.postings = {term: dict(ranks) for term, ranks in postings.items()}
+        self.terms = sorted(self.postings)
+
+    def invalidate(self):
+        cache.set(SEARCH_INDEX_VERSION_KEY, uuid4().hex, None)
+        self.version = None
+
+    def match(self, term):
+        ranks = defaultdict(float)
+        for token in self.terms[bisect_left(self.terms, term):]:
+            if not token.startswith(term):
+                break
+            for recipe_id, rank in self.postings[token].items():
+                ranks[recipe_id] += rank
+        return ranks
+
+    def search(self, query):
+        result = None
+        for term in tokenize(query):
+            ranks = self.match(term)
+            if result is not None:
+                ranks = {
+                    recipe_id: result[recipe_id] + rank
+                    for recipe_id, rank in ranks.items()
+                    if recipe_id in result
+                }
+            result = ranks
+        return result or {}
+
+
+search_index = RecipeSearchIndex()
@@ -0,0 +1,147 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+from recipes import tasks
+from recipes.catalog import catalog
+from recipes.feed import backfill_feed, fan_out_recipe, remove_from_feed
+from recipes.images import process_recipe_image
+from recipes.matching import match_index
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientList, Recipe,
+                            ShoppingList, ShoppingListIngredient, Tag)
+from recipes.search import update_search_vectors
+from recipes.user_state import invalidate_user_state
+from users.models import Follow
+
+recipe_changed = Signal()
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(sender, instance, **kwargs):
+    changes = Counter()
+    for ingredient_id, amount in IngredientList.objects.filter(
+        recipe=instance
+    ).values_list('ingredient_id', 'amount'):
+        changes[ingredient_id] -= amount
+    ShoppingListIngredient.objects.change_recipe(instance, changes)
+
+
+def touch_recipes(recipes):
+    recipes.update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_recipe_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        touch_recipes(Recipe.objects.filter(id=instance.pk))
+    elif pk_set:
+        touch_recipes(Recipe.objects.filter(id__in=pk_set))
+
+
+@receiver(post_save, sender=IngredientList)
+@receiver(post_delete, sender=IngredientList)
+def touch_recipe_ingredients(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(id=instance.recipe_id))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_tag_recipes(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_catalog(sender, **kwargs):
+    transaction.on_commit(catalog.invalidate)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_delete, sender=FavoriteRecipe)
+def invalidate_favorites_state(sender, instance, **kwargs):
+    invalidate_user_state(instance.author_id)
+
+
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_user_lists_state(sender, instance, **kwargs):
+    invalidate_user_state(instance.user_id)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_follower_feed(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: tasks.submit(
+            backfill_feed, instance.user_id, instance.author_id
+        ))
+
+
+@receiver(post_delete, sender=Follow)
+def clear_follower_feed(sender, instance, **kwargs):
+    remove_from_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, **kwargs):
+    transaction.on_commit(lambda: update_search_vectors((instance.id,)))
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_search_vectors(sender, instance, created, **kwargs):
+    if created:
+        return
+    transaction.on_commit(
+        lambda: update_search_vectors(
+            Recipe.objects.filter(ingredients=instance).values('id')
+        )
+    )
+
+
+@receiver(recipe_changed, sender=Recipe)
+def process_image(sender, recipe, changes, **kwargs):
+    if changes['created'] or 'image' in changes['fields']:
+        tasks.submit(process_recipe_image, recipe.id)
+
+
+@receiver(recipe_changed, sender=Recipe)
+def fan_out_to_followers(sender, recipe, changes, **kwargs):
+    if changes['created']:
+        tasks.submit(fan_out_recipe, recipe.id)
+
+
+@receiver(recipe_changed, sender=Recipe)
+def update_match_index(sender, recipe, changes, **kwargs):
+    if changes['ingredients_added'] or changes['ingredients_removed']:
+        match_index.publish({recipe.id: changes['ingredients_removed']})
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_match_index(sender, instance, **kwargs):
+    recipe_id = instance.id
+    removed = list(
+        IngredientList.objects.filter(recipe=instance).values_list(
+            'ingredient_id', flat=True
+        )
+    )
+    transaction.on_commit(
+        lambda: match_index.publish({recipe_id: removed})
+    )
+
+
+@receiver(pre_delete, sender=Ingredient)
+def rebuild_match_index(sender, **kwargs):
+    transaction.on_commit(match_index.invalidate)
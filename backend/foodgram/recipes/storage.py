@@ -0,0 +1,37 @@
+import os
+import posixpath
+from hashlib import sha256
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_content_name(self, name, content):
+        digest = sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory = posixpath.dirname(name)
+        stem, extension = posixpath.splitext(posixpath.basename(name))
+        if len(stem) == len(digest) and (
+            posixpath.basename(directory) == stem[:2]
+        ):
+            directory = posixpath.dirname(directory)
+        return posixpath.join(
+            directory, digest[:2], f'{digest}{extension.lower()}'
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        saved_name = self._save(name, content)
+        if saved_name != name:
+            self.delete(saved_name)
+        return name
@@ -0,0 +1,32 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.BACKGROUND_WORKERS,
+        thread_name_prefix='foodgram-worker'
+    )
+
+
+def run_task(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Ошибка в фоновой задаче %s', func.__name__)
+    finally:
+        connections.close_all()
+
+
+def submit(func, *args):
+    if settings.BACKGROUND_TASKS_EAGER:
+        func(*args)
+        return
+    get_executor().submit(run_task, func, *args)
@@ -0,0 +1,73 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from recipes.models import FavoriteRecipe, ShoppingList
+from users.models import Follow
+
+USER_STATE_KEY = 'user-state:{}'
+USER_STATE_GENERATION_KEY = 'user-state:{}:generation'
+
+
+class UserState:
+    def __init__(self, user_id=None, favorites=(), cart=(), following=()):
+        self.user_id = user_id
+        self.favorites = set(favorites)
+        self.cart = set(cart)
+        self.following = set(following)
+
+    @classmethod
+    def load(cls, user):
+        if not user.is_authenticated:
+            return cls()
+        key = USER_STATE_KEY.format(user.id)
+        generation_key = USER_STATE_GENERATION_KEY.format(user.id)
+        timeout = settings.USER_STATE_CACHE_TIMEOUT
+        if timeout:
+            cache.add(generation_key, uuid4().hex, None)
+            cached = cache.get_many((key, generation_key))
+            generation = cached.get(generation_key)
+            if key in cached and cached[key][0] == generation:
+                return cls(user.id, *cached[key][1:])
+        state = cls(
+            user.id,
+            FavoriteRecipe.objects.filter(author=user).values_list(
+                'recipe_id', flat=True
+            ),
+            ShoppingList.objects.filter(user=user).values_list(
+                'recipe_id', flat=True
+            ),
+            Follow.objects.filter(user=user).values_list(
+                'author_id', flat=True
+            ),
+        )
+        if timeout and cache.get(generation_key) == generation:
+            cache.set(
+                key,
+                (generation, state.favorites, state.cart, state.following),
+                timeout
+            )
+        return state
+
+
+def invalidate_user_state(user_id):
+    transaction.on_commit(lambda: cache.set(
+        USER_STATE_GENERATION_KEY.format(user_id), uuid4().hex, None
+    ))
+
+
+def get_user_state(request):
+    state = getattr(request, 'user_state', None)
+    if state is None or state.user_id != request.user.id:
+        state = UserState.load(request.user)
+        request.user_state = state
+    return state
+
+
+def update_user_state(request, name, added=(), removed=()):
+    state = getattr(request, 'user_state', None)
+    if state is not None and state.user_id == request.user.id:
+        getattr(state, name).update(added)
+        getattr(state, name).difference_update(removed)
+    invalidate_user_state(request.user.id)
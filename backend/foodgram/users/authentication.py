@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from copy import copy
+from hashlib import sha256
+from threading import Lock
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenUserCache:
+    def __init__(self):
+        self.lock = Lock()
+        self.entries = OrderedDict()
+
+    @property
+    def enabled(self):
+        return not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+    def get_cache_keys(self, key):
+        digest = sha256(key.encode()).hexdigest()
+        return f'auth-token-stamp:{digest}', f'auth-token:{digest}'
+
+    def get(self, key):
+        stamp_key, user_key = self.get_cache_keys(key)
+        stamp = cache.get(stamp_key)
+        if stamp is None:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self.entries.move_to_end(key)
+                return copy(entry[1])
+        user = cache.get(user_key)
+        if user is not None:
+            self.remember(key, stamp, copy(user))
+        return user
+
+    def set(self, key, user):
+        stamp = uuid4().hex
+        cache.set_many(
+            dict(zip(self.get_cache_keys(key), (stamp, user))),
+            settings.TOKEN_CACHE_TIMEOUT
+        )
+        self.remember(key, stamp, copy(user))
+
+    def remember(self, key, stamp, user):
+        with self.lock:
+            self.entries[key] = (stamp, user)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.TOKEN_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, keys):
+        keys = list(keys)
+        cache.delete_many([
+            cache_key
+            for key in keys
+            for cache_key in self.get_cache_keys(key)
+        ])
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+
+token_cache = TokenUserCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        if not token_cache.enabled:
+            return super().authenticate_credentials(key)
+        user = token_cache.get(key)
+        if user is not None:
+            return user, Token(key=key, user=user)
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user)
+        return user, token
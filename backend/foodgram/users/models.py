@@ -78,6 +78,12 @@ class Follow(models.Model):
                 name='unique_follow',
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user_idx'
+            ),
+        )
 
     def __str__(self):
         return f'Пользователь {self.user} подписан на {self.author}'
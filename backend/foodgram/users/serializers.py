@@ -1,6 +1,7 @@
 from djoser.serializers import UserCreateSerializer, UserSerializer
+from recipes.user_state import get_user_state
 from rest_framework import serializers
-from users.models import Follow, User
+from users.models import User
 
 
 class CustomUserSerializer(UserSerializer):
@@ -21,10 +22,10 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscibed(self, obj):
-        user = self.context.get('request').user
-        if not user.is_authenticated:
+        request = self.context.get('request')
+        if request is None:
             return False
-        return Follow.objects.filter(user=user, author=obj.id).exists()
+        return obj.id in get_user_state(request).following
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
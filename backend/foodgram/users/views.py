@@ -1,7 +1,10 @@
 from api.pagination import StandartProjectPagination
 from api.serializers import FollowListSerializer, FollowSerializer
+from django.db.models import Count
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
+from recipes.models import Recipe
+from recipes.user_state import update_user_state
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.permissions import (IsAuthenticated,
@@ -15,6 +18,7 @@ class CustomUserViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = StandartProjectPagination
+    keyset_ordering = ('id',)
     permission_classes = (IsAuthenticatedOrReadOnly,)
 
     @action(
@@ -24,8 +28,17 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(author__user=user)
+        queryset = User.objects.filter(author__user=user).annotate(
+            recipes_count=Count('recipes', distinct=True)
+        ).order_by('id')
         pages = self.paginate_queryset(queryset)
+        recipes_limit = request.query_params.get('recipes_limit', '')
+        recipes = Recipe.objects.latest_by_author(
+            (author.id for author in pages),
+            int(recipes_limit) if recipes_limit.isdigit() else None
+        )
+        for author in pages:
+            author.recipes_preview = recipes[author.id]
         serializer = FollowListSerializer(
             pages,
             many=True,
@@ -50,9 +63,11 @@ class CustomUserViewSet(UserViewSet):
             )
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            update_user_state(request, 'following', added=(author.id,))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         follow_data = get_object_or_404(Follow, user=user, author=author)
         follow_data.delete()
+        update_user_state(request, 'following', removed=(author.id,))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(